@@ -0,0 +1,103 @@
+import math
+import logging
+from typing import Optional
+import numpy as np
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+
+# IVF-PQ 訓練點數不足時 (小型知識庫或小分類) 改用 Flat
+_MIN_IVFPQ_VECTORS = 256
+
+
+def ann_settings() -> dict:
+    """影響索引內容的建置參數 (搜尋參數 efSearch / nprobe 不影響索引，不列入)"""
+    index_type = settings.INDEX_TYPE
+    if index_type == "hnsw":
+        return {"index_type": index_type, "hnsw_m": settings.HNSW_M,
+                "hnsw_ef_construction": settings.HNSW_EF_CONSTRUCTION}
+    if index_type == "ivfpq":
+        return {"index_type": index_type, "ivf_nlist": settings.IVF_NLIST,
+                "ivf_pq_m": settings.IVF_PQ_M, "ivf_pq_nbits": settings.IVF_PQ_NBITS}
+    return {"index_type": index_type}
+
+
+def _pq_subquantizers(dim: int, target: int) -> int:
+    """PQ 子向量數必須整除維度，取不超過 target 的最大因數"""
+    for m in range(min(target, dim), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def _build_ivfpq(vectors: np.ndarray):
+    import faiss
+
+    n, dim = vectors.shape
+    # 每個 cluster 至少約 39 個訓練點，否則 k-means 品質不佳
+    nlist = settings.IVF_NLIST or int(4 * math.sqrt(n))
+    nlist = max(1, min(nlist, n // 39))
+    m = _pq_subquantizers(dim, settings.IVF_PQ_M)
+    nbits = min(settings.IVF_PQ_NBITS, int(math.log2(n)))
+
+    quantizer = faiss.IndexFlatL2(dim)
+    index = faiss.IndexIVFPQ(quantizer, dim, nlist, m, nbits)
+    # Hashtable direct map 才能以 id 還原向量 (分類質心使用)
+    index.set_direct_map_type(faiss.DirectMap.Hashtable)
+
+    train_size = min(n, settings.IVF_TRAIN_SIZE)
+    sample = vectors
+    if train_size < n:
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(n, train_size, replace=False)]
+    logger.info(f"Training IVF-PQ index (nlist={nlist}, m={m}, nbits={nbits}) on {len(sample)} vectors...")
+    index.train(sample)
+    return index
+
+
+def create_index(vectors: np.ndarray, index_type: Optional[str] = None):
+    """
+    依 INDEX_TYPE 建立 (並訓練) 空的 FAISS 索引，距離度量固定為 L2，
+    與 LangChain FAISS 的相關度換算一致。向量由呼叫端加入。
+    """
+    import faiss
+
+    index_type = index_type or settings.INDEX_TYPE
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown INDEX_TYPE: {index_type} (expected one of {INDEX_TYPES})")
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    dim = vectors.shape[1]
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, settings.HNSW_M)
+        index.hnsw.efConstruction = settings.HNSW_EF_CONSTRUCTION
+    elif index_type == "ivfpq" and len(vectors) >= _MIN_IVFPQ_VECTORS:
+        index = _build_ivfpq(vectors)
+    else:
+        if index_type == "ivfpq":
+            logger.info(f"Only {len(vectors)} vectors, too few to train IVF-PQ; using a flat index")
+        index = faiss.IndexFlatL2(dim)
+    configure_search(index)
+    return index
+
+
+def configure_search(index):
+    """套用搜尋參數 (載入持久化索引後也需呼叫)"""
+    import faiss
+
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = settings.HNSW_EF_SEARCH
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(settings.IVF_NPROBE, index.nlist)
+
+
+def supports_removal(index) -> bool:
+    """
+    LangChain FAISS.delete 假設 remove_ids 後位置會往前壓縮，只有 Flat 索引如此；
+    HNSW 不支援刪除、IVF 刪除後不會重新編號。
+    """
+    import faiss
+
+    return isinstance(index, faiss.IndexFlat)
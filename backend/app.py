@@ -1,36 +1,267 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 import uvicorn
+import time
+import asyncio
 from contextlib import asynccontextmanager
+from typing import List, Optional, Tuple
+from langchain_core.messages import HumanMessage, AIMessage
 
 from .config import settings
 from .models import QueryRequest, QueryResponse
 from .rag_engine import RAGComponents
 from .graph import GraphBuilder
+from .streaming import stream_query_events, format_sse
+from .kb_reload import KnowledgeBaseReloader
+from .semantic_cache import SemanticCache
+from .checkpointer import create_checkpointer
+from .metrics import REGISTRY, REQUESTS, REQUEST_DURATION, start_request_timings
+from .tracing import setup_tracing, start_trace, span, annotate, trace_callbacks
 from .logger import setup_logging
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 冷啟動計時起點 (模組匯入時)
+BOOT_STARTED = time.perf_counter()
+
 # Global Variables (State)
 rag_system = None
+graph_builder = None
 app_graph = None
+kb_reloader = None
+answer_cache = None
+checkpointer = None
+trace_listener = None
+startup_task = None
+cold_start_seconds = None
+# 元件載入失敗的原因 (致命：liveness 轉為失敗，由 orchestrator 重啟)
+startup_error = None
+# 暖機狀態 (非致命：失敗時仍轉為就緒，首個請求自行承擔暖機延遲)
+warm_up_status = {"status": "pending"}
 
 async def init_system():
-    """初始化系統元件"""
-    global rag_system, app_graph
-    rag_system = RAGComponents()
-    builder = GraphBuilder(rag_system)
-    app_graph = builder.build()
+    """
+    初始化系統元件：graph 與 checkpointer 立即建立，模型與知識庫於背景平行載入，
+    服務先回應 liveness 探測，載入與暖機完成後 readiness 才轉為就緒。
+    """
+    global rag_system, graph_builder, app_graph, kb_reloader, answer_cache, checkpointer, startup_task
+    rag_system = RAGComponents(lazy=True)
+    checkpointer = await create_checkpointer()
+    graph_builder = GraphBuilder(rag_system)
+    app_graph = graph_builder.build(checkpointer)
+    kb_reloader = KnowledgeBaseReloader(rag_system)
+    startup_task = asyncio.create_task(load_components())
+    if settings.SEMANTIC_CACHE_ENABLED:
+        answer_cache = SemanticCache(
+            threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+            max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.SEMANTIC_CACHE_TTL
+        )
+    if settings.METRICS_ENABLED:
+        REGISTRY.register_collector(collect_runtime_metrics)
+
+async def load_components():
+    """背景載入模型與知識庫並暖機，完成後記錄冷啟動時間並開始監看知識庫"""
+    global cold_start_seconds, startup_error
+    try:
+        await rag_system.aload()
+    except Exception as e:
+        startup_error = f"{type(e).__name__}: {e}"
+        logger.error(f"System startup failed: {e}")
+        return
+    warm_up_seconds = await warm_up_components()
+    if settings.KB_WATCH_ENABLED:
+        kb_reloader.start_watching()
+    cold_start_seconds = round(time.perf_counter() - BOOT_STARTED, 2)
+    breakdown = ", ".join(
+        f"{name} {status['seconds']:.1f}s" for name, status in rag_system.component_status.items() if "seconds" in status
+    )
+    logger.info(f"Cold start complete: ready in {cold_start_seconds:.1f}s ({breakdown}, warm-up {warm_up_seconds:.1f}s)")
+
+async def warm_up_components() -> float:
+    """暖機本地模型並預先載入 Ollama 模型；失敗只記錄在 warm_up_status，不影響就緒"""
+    if not settings.STARTUP_WARMUP_ENABLED:
+        warm_up_status.update(status="skipped")
+        return 0.0
+    start = time.perf_counter()
+    warm_up_status.update(status="running")
+    try:
+        # 本地模型暖機與 Ollama 預先載入同時進行
+        await asyncio.gather(asyncio.to_thread(rag_system.warm_up), rag_system.aping_llm())
+        warm_up_status.update(status="ready", warm=True)
+    except Exception as e:
+        warm_up_status.update(status="failed", warm=False, error=f"{type(e).__name__}: {e}")
+        logger.warning(f"Warm-up failed, continuing without it: {e}")
+    warm_up_seconds = time.perf_counter() - start
+    warm_up_status["seconds"] = round(warm_up_seconds, 2)
+    return warm_up_seconds
+
+def system_ready() -> bool:
+    return app_graph is not None and rag_system is not None and rag_system.ready and cold_start_seconds is not None
+
+def collect_runtime_metrics():
+    """scrape 時將既有的快取、守衛、快速路徑與回答優化統計轉為 Prometheus metrics"""
+    families = []
+    if rag_system:
+        caches = dict(rag_system.cache_stats())
+        if answer_cache:
+            caches["semantic"] = answer_cache.stats()
+        families.append(("rag_cache_hits_total", "counter", "Cache hits by cache.",
+                         [({"cache": name}, stats["hits"]) for name, stats in caches.items()]))
+        families.append(("rag_cache_misses_total", "counter", "Cache misses by cache.",
+                         [({"cache": name}, stats["misses"]) for name, stats in caches.items()]))
+    if graph_builder:
+        families.append(("rag_guardrail_decisions_total", "counter", "Guardrail decisions by tier.",
+                         [({"tier": tier}, count) for tier, count in graph_builder.guardrail_prefilter.counters.items()]))
+        families.append(("rag_calculator_fast_path_total", "counter", "Calculator fast path hits and LLM fallbacks.",
+                         [({"result": result}, count) for result, count in graph_builder.calculator_stats.items()]))
+        optimizer = graph_builder.optimizer_stats.stats()
+        families.append(("rag_answer_optimizations_total", "counter", "Answer optimizations by method.",
+                         [({"method": "local"}, optimizer["local"]), ({"method": "llm"}, optimizer["llm"])]))
+    return families
+
+def observe_request(path: str, start: float, timings: Optional[list], response: QueryResponse) -> QueryResponse:
+    """記錄請求路徑與總耗時 (metrics 與 request span)；debug 時將各節點耗時附在回應中"""
+    elapsed = time.perf_counter() - start
+    REQUESTS.inc(path=path)
+    REQUEST_DURATION.observe(elapsed, path=path)
+    annotate(path=path, success=response.success)
+    if timings is not None:
+        response.timings = timings + [{"node": "total", "ms": round(elapsed * 1000, 2)}]
+    return response
+
+def answer_path(result: dict) -> str:
+    return result.get("fast_path") or "graph"
+
+def build_initial_state(question: str) -> dict:
+    """建立每次查詢的初始狀態"""
+    return {
+        "original_query": question,
+        "rewritten_query": "",
+        "retrieved_docs": [],
+        "speculative_docs": [],
+        "reranked_docs": [],
+        "rerank_scores": [],
+        "context": "",
+        "final_answer": "",
+        "error": "",
+        "tool_call_count": 0,  # 初始化工具調用計數器
+        "fast_path": "",
+        "messages": []
+    }
+
+def build_query_response(result: dict) -> QueryResponse:
+    """將 graph 最終狀態轉換為 API 回應"""
+    # 處理 final_answer 可能為 None 的情況（例如達到工具調用限制時）
+    final_answer = result.get("final_answer")
+    if final_answer is None:
+        # 檢查是否達到工具調用限制
+        tool_call_count = result.get("tool_call_count", 0)
+        if tool_call_count > 3:
+            final_answer = "抱歉，我無法完成這個操作（達到工具調用次數限制）。請簡化您的問題或提供更明確的資訊。"
+        else:
+            final_answer = "抱歉，我無法生成適當的回覆。請重新表述您的問題。"
+    
+    return QueryResponse(
+        success=True,
+        original_query=result.get("original_query", ""),
+        rewritten_query=result.get("rewritten_query", ""),
+        answer=final_answer,
+        context=result.get("context", "")
+    )
+
+async def record_direct_answer(question: str, response: QueryResponse, config: dict):
+    """將未經 graph 的問答寫回對話紀錄，讓後續追問仍有上下文"""
+    await app_graph.aupdate_state(config, {
+        "original_query": question,
+        "rewritten_query": response.rewritten_query,
+        "context": response.context,
+        "final_answer": response.answer,
+        "error": "",
+        "messages": [HumanMessage(content=question), AIMessage(content=response.answer)]
+    }, as_node="optimize_response")
+
+async def try_fast_path(question: str, config: dict) -> Tuple[Optional[QueryResponse], Optional[List[float]]]:
+    """
+    首輪對話 (無歷史) 先走快速路徑：FAQ 精確比對 -> 語意快取。
+    回傳 (命中時的回應, 查詢向量)；向量供未命中時於執行完 graph 後寫入快取。
+    """
+    snapshot = await app_graph.aget_state(config)
+    if snapshot.values.get("messages"):
+        # 多輪對話的答案依賴上下文，不使用快速路徑
+        return None, None
+    
+    response = None
+    vector = None
+    
+    if settings.FAQ_FAST_PATH_ENABLED:
+        doc = rag_system.match_faq(question)
+        if doc is not None:
+            kb_question = doc.page_content.replace('問題:', '', 1).strip()
+            answer = str(doc.metadata.get("answer", ""))
+            logger.info(f"FAQ exact match: {kb_question}")
+            if settings.FAQ_FAST_PATH_OPTIMIZE:
+                answer = await graph_builder.optimize_answer(answer)
+            else:
+                answer = graph_builder.cc.convert(answer)
+            response = QueryResponse(
+                success=True,
+                original_query=question,
+                rewritten_query=kb_question,
+                answer=answer,
+                context=f"第1名相關文件:\n問題: {kb_question}\n答案: {doc.metadata.get('answer', '')}"
+            )
+    
+    if response is None and answer_cache:
+        vector = await rag_system.aembed_query(question)
+        payload = answer_cache.lookup(vector, rag_system.kb_version)
+        if payload is not None:
+            response = QueryResponse(
+                success=True,
+                original_query=question,
+                rewritten_query=payload["rewritten_query"],
+                answer=payload["answer"],
+                context=payload["context"]
+            )
+    
+    if response is not None:
+        await record_direct_answer(question, response, config)
+    return response, vector
+
+def store_answer_cache(question: str, vector: Optional[List[float]], result: dict, kb_version: str):
+    """將首輪對話的完整結果寫入語意快取"""
+    if not answer_cache or vector is None:
+        return
+    if not SemanticCache.is_cacheable(question, result):
+        return
+    answer_cache.store(question, vector, {
+        "rewritten_query": result.get("rewritten_query", ""),
+        "answer": result["final_answer"],
+        "context": result.get("context", "")
+    }, kb_version)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    global trace_listener
     setup_logging()
+    trace_listener = setup_tracing()
     await init_system()
     yield
     # Shutdown
-    # Clean up if necessary
+    if startup_task and not startup_task.done():
+        startup_task.cancel()
+    if kb_reloader:
+        await kb_reloader.stop()
+    if rag_system:
+        rag_system.shutdown()
+    if checkpointer:
+        await checkpointer.aclose()
+    if trace_listener:
+        # 寫出佇列中剩餘的 span
+        trace_listener.stop()
 
 app = FastAPI(
     title=settings.APP_TITLE,
@@ -59,64 +290,174 @@ async def root():
 @app.post("/query", response_model=QueryResponse)
 async def query_endpoint(request: QueryRequest):
     """查詢端點"""
-    if not app_graph:
-        raise HTTPException(status_code=503, detail="系統未初始化")
+    if not system_ready():
+        raise HTTPException(status_code=503, detail="系統啟動中")
     
     if not request.question.strip():
         raise HTTPException(status_code=400, detail="問題不能為空")
     
     # 執行查詢
-    initial_state = {
-        "original_query": request.question,
-        "rewritten_query": "",
-        "retrieved_docs": [],
-        "reranked_docs": [],
-        "context": "",
-        "final_answer": "",
-        "error": "",
-        "tool_call_count": 0,  # 初始化工具調用計數器
-        "messages": []
+    initial_state = build_initial_state(request.question)
+    start = time.perf_counter()
+    timings = start_request_timings() if request.debug else None
+    
+    start_trace(request.thread_id)
+    
+    with span("request", "query"):
+        try:
+            # 🔑 建立包含 thread_id 的配置項目
+            config = {"configurable": {"thread_id": request.thread_id}, "callbacks": trace_callbacks()}
+            
+            cached, query_vector = await try_fast_path(request.question, config)
+            if cached:
+                return observe_request("fast_path", start, timings, cached)
+            
+            # ainvoke returns the final state (不阻塞 event loop)
+            kb_version = rag_system.kb_version
+            result = await app_graph.ainvoke(initial_state, config=config)
+            store_answer_cache(request.question, query_vector, result, kb_version)
+            return observe_request(answer_path(result), start, timings, build_query_response(result))
+        except Exception as e:
+            logger.error(f"Error processing query: {e}")
+            return observe_request("error", start, timings, QueryResponse(
+                success=False,
+                error=str(e)
+            ))
+
+@app.post("/query/stream")
+async def query_stream_endpoint(request: QueryRequest):
+    """串流查詢端點 (Server-Sent Events)"""
+    if not system_ready():
+        raise HTTPException(status_code=503, detail="系統啟動中")
+    
+    if not request.question.strip():
+        raise HTTPException(status_code=400, detail="問題不能為空")
+    
+    initial_state = build_initial_state(request.question)
+    config = {"configurable": {"thread_id": request.thread_id}, "callbacks": trace_callbacks()}
+    
+    async def event_generator():
+        start = time.perf_counter()
+        timings = start_request_timings() if request.debug else None
+        start_trace(request.thread_id)
+        with span("request", "query_stream"):
+            try:
+                cached, query_vector = await try_fast_path(request.question, config)
+                if cached:
+                    yield format_sse("done", observe_request("fast_path", start, timings, cached).model_dump())
+                    return
+                
+                kb_version = rag_system.kb_version
+                async for sse in stream_query_events(app_graph, initial_state, config, graph_builder.cc):
+                    yield sse
+                snapshot = await app_graph.aget_state(config)
+                store_answer_cache(request.question, query_vector, snapshot.values, kb_version)
+                response = observe_request(answer_path(snapshot.values), start, timings, build_query_response(snapshot.values))
+                yield format_sse("done", response.model_dump())
+            except Exception as e:
+                logger.error(f"Error streaming query: {e}")
+                response = observe_request("error", start, timings, QueryResponse(success=False, error=str(e)))
+                yield format_sse("error", response.model_dump())
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def verify_admin_token(token: str):
+    """驗證管理端點權杖"""
+    if settings.ADMIN_TOKEN and token != settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="未授權")
+
+@app.post("/admin/reload-kb", status_code=202)
+async def reload_kb_endpoint(force: bool = False, x_admin_token: str = Header(default="")):
+    """於背景重建知識庫並熱替換 (不中斷服務)"""
+    verify_admin_token(x_admin_token)
+    if not system_ready():
+        raise HTTPException(status_code=503, detail="系統啟動中")
+    
+    started = kb_reloader.trigger(force=force)
+    return {
+        "status": "started" if started else "in_progress",
+        **kb_reloader.status()
     }
+
+@app.get("/admin/kb")
+async def kb_status_endpoint(x_admin_token: str = Header(default="")):
+    """知識庫版本與重建狀態"""
+    verify_admin_token(x_admin_token)
+    if not kb_reloader:
+        raise HTTPException(status_code=503, detail="系統未初始化")
+    return kb_reloader.status()
+
+@app.get("/admin/cache")
+async def cache_status_endpoint(x_admin_token: str = Header(default="")):
+    """語意快取命中統計"""
+    verify_admin_token(x_admin_token)
+    if not answer_cache:
+        return {"enabled": False}
+    return {"enabled": True, **answer_cache.stats()}
+
+@app.get("/admin/stats")
+async def stats_endpoint(x_admin_token: str = Header(default="")):
+    """快取、守衛分層、推測執行、試算快速路徑、回答優化、各節點 token 用量與對話 checkpointer 統計"""
+    verify_admin_token(x_admin_token)
+    if not graph_builder:
+        raise HTTPException(status_code=503, detail="系統未初始化")
     
-    try:
-        # 🔑 建立包含 thread_id 的配置項目
-        config = {"configurable": {"thread_id": request.thread_id}}
-        
-        # invoke returns the final state
-        result = app_graph.invoke(initial_state, config=config)
-        
-        # 處理 final_answer 可能為 None 的情況（例如達到工具調用限制時）
-        final_answer = result.get("final_answer")
-        if final_answer is None:
-            # 檢查是否達到工具調用限制
-            tool_call_count = result.get("tool_call_count", 0)
-            if tool_call_count > 3:
-                final_answer = "抱歉，我無法完成這個操作（達到工具調用次數限制）。請簡化您的問題或提供更明確的資訊。"
-            else:
-                final_answer = "抱歉，我無法生成適當的回覆。請重新表述您的問題。"
-        
-        return QueryResponse(
-            success=True,
-            original_query=result.get("original_query", ""),
-            rewritten_query=result.get("rewritten_query", ""),
-            answer=final_answer,
-            context=result.get("context", "")
-        )
-    except Exception as e:
-        logger.error(f"Error processing query: {e}")
-        return QueryResponse(
-            success=False,
-            error=str(e)
-        )
+    speculation = dict(graph_builder.speculation_stats)
+    passed = speculation["requests"] - speculation["blocked_discarded"]
+    speculation["avg_saved_ms"] = speculation["saved_ms_total"] / passed if passed else 0.0
+    return {
+        "semantic_cache": answer_cache.stats() if answer_cache else None,
+        "retrieval_caches": rag_system.cache_stats(),
+        "guardrail": graph_builder.guardrail_prefilter.stats(),
+        "speculation": speculation,
+        "calculator": dict(graph_builder.calculator_stats),
+        "optimizer": graph_builder.optimizer_stats.stats(),
+        "token_usage": graph_builder.token_usage.stats(),
+        "checkpointer": await checkpointer.astats() if checkpointer else None
+    }
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus 格式的各節點延遲、LLM token、重試、工具迴圈與快取命中 metrics"""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="metrics 未啟用")
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/health")
 async def health_check():
     """健康檢查"""
     return {
         "status": "healthy",
-        "system_initialized": app_graph is not None
+        "system_initialized": system_ready()
     }
 
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness：程序可回應即為存活 (模型載入期間也回傳 200)；元件載入失敗時回傳 503 以觸發重啟"""
+    if startup_error is not None:
+        return JSONResponse(status_code=503, content={"status": "failed", "startup_error": startup_error})
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness：模型、知識庫載入與暖機完成才回傳 200，並回報各元件狀態"""
+    ready = system_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "components": rag_system.component_status if rag_system else {},
+            "warm_up": warm_up_status,
+            "startup_error": startup_error,
+            "cold_start_seconds": cold_start_seconds,
+            "uptime_seconds": round(time.perf_counter() - BOOT_STARTED, 2),
+        }
+    )
+
 if __name__ == "__main__":
     logger.info(f"Starting {settings.APP_TITLE}")
     uvicorn.run(app, host=settings.HOST, port=settings.PORT)
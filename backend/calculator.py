@@ -0,0 +1,260 @@
+import re
+import logging
+from typing import List, Optional, Sequence
+from langchain_core.messages import BaseMessage, HumanMessage
+from .normalization import normalize_text
+from .tools import calculate_vacation_pay, calculate_unused_overtime_pay
+
+logger = logging.getLogger(__name__)
+
+# 月薪合理範圍 (新台幣)，超出視為擷取錯誤
+MIN_MONTHLY_SALARY = 1000
+MAX_MONTHLY_SALARY = 1000000
+# 時數上限 (分鐘)：一年
+MAX_DURATION_MINUTES = 365 * 480
+
+_CN_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "兩": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_CN_UNITS = {"十": 10, "百": 100, "千": 1000}
+_CN_NUM = r"[零〇一二兩三四五六七八九十百千萬]+"
+_NUM = rf"\d+(?:\.\d+)?|{_CN_NUM}"
+
+# 月薪：關鍵字後 (可有「是」、「約」、冒號等) 接金額，支援 45,000 / 4.5萬 / 4萬5 / 45k / 四萬五
+_SALARY_PATTERN = re.compile(
+    r"(?:月薪|薪水|薪資|月領|底薪|月收入)[^\d零〇一二兩三四五六七八九十]{0,6}?"
+    rf"(?P<amount>\d[\d,]*(?:\.\d+)?\s*(?:萬\d?|千\d?|k)?|{_CN_NUM})"
+)
+_AMOUNT_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(萬|千|k)?(\d)?")
+
+# 時數片段 (依序嘗試；「1個半天」、「1個半小時」須在一般的天 / 小時之前)
+_DURATION_PATTERN = re.compile(
+    rf"(?:(?P<half_days>{_NUM})\s*個)?半天"
+    rf"|(?P<days>{_NUM})\s*個?(?:工作)?天(?P<days_half>半)?"
+    rf"|(?P<hours_half>{_NUM})\s*個半(?:小時|鐘頭)"
+    rf"|(?P<hours>{_NUM})\s*個?(?:小時|鐘頭|hrs?|h)(?P<hours_tail>半)?"
+    r"|(?P<half_hour>半(?:小時|鐘頭))"
+    rf"|(?P<minutes>{_NUM})\s*(?:分鐘?|mins?|m)"
+)
+# 時數片段後緊接數字 (如「3天5」) 或未支援單位的數量 (如「30s」)，表示有無法解析的時數
+_TRAILING_NUMBER = re.compile(r"\s*[\d零〇一二兩三四五六七八九十]")
+_UNPARSED_DURATION = re.compile(r"\d+(?:\.\d+)?\s*(?:[a-jl-z]+|秒|週|周)")
+# 同一段時數的片段之間只允許這些連接字，例如「1天又3小時30分鐘」
+_CONNECTOR = re.compile(r"[\s,、又和加及與再零]*")
+
+_VACATION_PATTERN = re.compile(r"特休|特別休假|年假")
+_OVERTIME_PATTERN = re.compile(r"加班|補休")
+# 依加班時段倍率計算的加班費不適用補休折算工具，交給 LLM
+_OVERTIME_RATE_PATTERN = re.compile(r"倍|平日|休息日|例假日|國定|假日")
+# 問題需明確要求試算
+_CALC_INTENT_PATTERN = re.compile(r"算|多少|金額|幾元|幾塊|能領|可以領|可領")
+# 且須為未休時數的結算 (折算金額、換錢、領錢)
+_SETTLEMENT_PATTERN = re.compile(r"未休|沒休|剩|折算|換(?:成)?(?:錢|現金)|領")
+# 並詢問金額 (「剩下特休3天要多少天才能用完」不是結算試算)
+_MONEY_PATTERN = re.compile(r"領|折算|工資|錢|金額|幾元|幾塊|現金")
+# 請假扣薪、補休期限或時數、計算規定等問題不是結算試算，交給 LLM
+_NON_SETTLEMENT_PATTERN = re.compile(r"扣|期限|多久|時間|算法|規定|計算方式")
+
+
+def _parse_chinese_number(text: str) -> Optional[int]:
+    """中文數字轉整數，支援口語省略 (四萬五 = 45000、三千二 = 3200)"""
+    total = section = digit = 0
+    last_unit = 1
+    for ch in text:
+        if ch in _CN_DIGITS:
+            digit = _CN_DIGITS[ch]
+        elif ch in _CN_UNITS:
+            last_unit = _CN_UNITS[ch]
+            section += (digit or 1) * last_unit
+            digit = 0
+        elif ch == "萬":
+            total += (section + digit) * 10000
+            section = digit = 0
+            last_unit = 10000
+        else:
+            return None
+    if digit and len(text) >= 2 and (text[-2] in _CN_UNITS or text[-2] == "萬"):
+        digit *= last_unit // 10
+    return total + section + digit
+
+
+def parse_number(text: str) -> Optional[float]:
+    """阿拉伯或中文數字轉數值，支援 萬 / 千 / k 單位與「4萬5」的口語寫法"""
+    text = text.replace(",", "").replace(" ", "")
+    if not text:
+        return None
+    match = _AMOUNT_PATTERN.fullmatch(text)
+    if match:
+        value = float(match.group(1))
+        unit = {"萬": 10000, "千": 1000, "k": 1000}.get(match.group(2), 1)
+        if match.group(3):
+            if unit == 1:
+                return None
+            value += int(match.group(3)) / 10
+        return value * unit
+    value = _parse_chinese_number(text)
+    return float(value) if value is not None else None
+
+
+def extract_salary(text: str) -> Optional[int]:
+    """擷取月薪 (需有月薪 / 薪水等關鍵字)；有多個不同金額時視為不明確"""
+    amounts = set()
+    for match in _SALARY_PATTERN.finditer(text):
+        value = parse_number(match.group("amount"))
+        if value is not None and MIN_MONTHLY_SALARY <= value <= MAX_MONTHLY_SALARY:
+            amounts.add(int(round(value)))
+    return amounts.pop() if len(amounts) == 1 else None
+
+
+def _atom_minutes(match: re.Match) -> Optional[float]:
+    groups = match.groupdict()
+    if groups["half_hour"]:
+        return 30
+    if match.group(0).endswith("半天") and groups["days"] is None:
+        count = parse_number(groups["half_days"]) if groups["half_days"] else 1
+        return count * 240 if count is not None else None
+    for name, minutes in (("days", 480), ("hours_half", 60), ("hours", 60), ("minutes", 1)):
+        if groups[name] is None:
+            continue
+        count = parse_number(groups[name])
+        if count is None:
+            return None
+        value = count * minutes
+        if name == "days" and groups["days_half"]:
+            value += 240
+        elif name == "hours_half" or (name == "hours" and groups["hours_tail"]):
+            value += 30
+        return value
+    return None
+
+
+def extract_duration_minutes(text: str) -> Optional[float]:
+    """
+    擷取時數並換算為分鐘 (1 天 = 8 小時、半天 = 4 小時)。
+    片段須相連 (如「2天3小時」)；出現兩段以上的時數 (如「加班3小時，補休1小時」)
+    或有無法解析的時數 (如「5h30s」) 視為不明確，不以部分結果試算。
+    """
+    matches = list(_DURATION_PATTERN.finditer(text))
+    if not matches:
+        return None
+    if _TRAILING_NUMBER.match(text, matches[-1].end()):
+        return None
+    remainder = "".join(
+        text[start:end] for start, end in zip([0] + [m.end() for m in matches], [m.start() for m in matches] + [len(text)])
+    )
+    if _UNPARSED_DURATION.search(remainder):
+        return None
+    for prev, current in zip(matches, matches[1:]):
+        if not _CONNECTOR.fullmatch(text[prev.end():current.start()]):
+            return None
+    total = 0.0
+    for match in matches:
+        minutes = _atom_minutes(match)
+        if minutes is None:
+            return None
+        total += minutes
+    return total if 0 < total <= MAX_DURATION_MINUTES else None
+
+
+def detect_topic(text: str) -> Optional[str]:
+    """vacation (特休) / overtime (加班、補休)；兩者皆有或皆無時回傳 None"""
+    vacation = bool(_VACATION_PATTERN.search(text))
+    overtime = bool(_OVERTIME_PATTERN.search(text))
+    if vacation == overtime:
+        return None
+    return "vacation" if vacation else "overtime"
+
+
+def extract_calculation(query: str, history_queries: Sequence[str] = ()) -> Optional[dict]:
+    """
+    由目前問題 (及先前的使用者問題) 擷取試算所需參數。
+    時數只取自目前問題；假別與月薪可沿用先前問題 (由新到舊)。
+    任何參數缺少或不明確時回傳 None，交由 LLM 處理。
+    """
+    text = normalize_text(query)
+    if not all(p.search(text) for p in (_CALC_INTENT_PATTERN, _SETTLEMENT_PATTERN, _MONEY_PATTERN)):
+        return None
+    if _NON_SETTLEMENT_PATTERN.search(text):
+        return None
+    minutes = extract_duration_minutes(text)
+    if minutes is None:
+        return None
+
+    history = [normalize_text(q) for q in reversed(history_queries)]
+    topic = detect_topic(text)
+    if topic is None and not _VACATION_PATTERN.search(text) and not _OVERTIME_PATTERN.search(text):
+        topic = next((t for t in map(detect_topic, history) if t), None)
+    salary = extract_salary(text)
+    if salary is None and not _SALARY_PATTERN.search(text):
+        salary = next((s for s in map(extract_salary, history) if s), None)
+    if topic is None or salary is None:
+        return None
+
+    if topic == "vacation":
+        half_days = minutes / 240
+        if half_days != int(half_days):
+            # 特休以半天為單位，不足半天的時數交給 LLM 說明
+            return None
+        return {
+            "tool": calculate_vacation_pay.name,
+            "args": {"monthly_salary": salary, "half_days_unused": int(half_days)},
+        }
+    if _OVERTIME_RATE_PATTERN.search(text):
+        return None
+    return {
+        "tool": calculate_unused_overtime_pay.name,
+        "args": {
+            "monthly_salary": salary,
+            "half_days": int(minutes // 240),
+            "remaining_minutes": int(minutes % 240) if minutes == int(minutes) else minutes % 240,
+        },
+    }
+
+
+def _fmt(value) -> str:
+    return f"{int(value):,}" if float(value) == int(value) else f"{value:,.2f}".rstrip("0").rstrip(".")
+
+
+def render_answer(calculation: dict, result) -> str:
+    """試算結果的固定格式回答 (與 optimize_response 的開頭、結尾一致)"""
+    args = calculation["args"]
+    salary = args["monthly_salary"]
+    daily = -(-salary // 30)
+    if calculation["tool"] == calculate_vacation_pay.name:
+        half_days = args["half_days_unused"]
+        lines = [
+            "同仁您好，依您提供的資料試算未休特休假工資如下：",
+            "",
+            f"- 月薪：{_fmt(salary)} 元",
+            f"- 未休特休：{_fmt(half_days)} 個半天",
+            f"- 日薪 = 月薪 ÷ 30 = {_fmt(daily)} 元 (無條件進位)",
+            f"- 特休假工資 = 日薪 × 0.5 × 半天數 = {_fmt(daily)} × 0.5 × {_fmt(half_days)} = **{_fmt(result)} 元** (無條件進位)",
+        ]
+    else:
+        half_days = args["half_days"]
+        remaining = args["remaining_minutes"]
+        total_minutes = half_days * 240 + remaining
+        lines = [
+            "同仁您好，依您提供的資料試算未休加班 (補休) 折算金額如下：",
+            "",
+            f"- 月薪：{_fmt(salary)} 元",
+            f"- 結算時數：{_fmt(half_days)} 個半天又 {_fmt(remaining)} 分鐘，共 {_fmt(total_minutes)} 分鐘",
+            f"- 日薪 = 月薪 ÷ 30 = {_fmt(daily)} 元 (無條件進位)",
+            f"- 金額 = 日薪 ÷ 480 分鐘 × 分鐘數 = {_fmt(daily)} ÷ 480 × {_fmt(total_minutes)} = **{_fmt(result)} 元** (無條件進位)",
+        ]
+    lines += ["", "以上為依規定公式的試算結果，實際金額以當月薪資單為準。", "", "若有其他需求歡迎詢問"]
+    return "\n".join(lines)
+
+
+def try_calculate(query: str, history_queries: Sequence[str] = ()) -> Optional[str]:
+    """參數齊全且明確時直接呼叫計算工具並回傳固定格式回答，否則回傳 None"""
+    calculation = extract_calculation(query, history_queries)
+    if calculation is None:
+        return None
+    tool = {t.name: t for t in (calculate_vacation_pay, calculate_unused_overtime_pay)}[calculation["tool"]]
+    result = tool.invoke(calculation["args"])
+    logger.info(f"Calculator fast path: {calculation['tool']}({calculation['args']}) = {result}")
+    return render_answer(calculation, result)
+
+
+def history_queries(messages: Sequence[BaseMessage]) -> List[str]:
+    """先前的使用者問題 (不含目前問題)"""
+    return [str(m.content) for m in messages[:-1] if isinstance(m, HumanMessage)]
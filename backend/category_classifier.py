@@ -0,0 +1,87 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from .ingestion import categorize_question
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class EmbeddingCategoryClassifier:
+    """
+    本地問題分類器：取代 classify_query 的 LLM 呼叫。
+
+    1. 關鍵字規則 (與 update_csv_metadata 相同的 categorize_question)
+    2. 各分類向量質心 (由 FAISS 中既有的知識庫向量計算) 的 cosine 相似度
+
+    信心不足 (分數過低或前兩名差距過小) 時回傳 None，由呼叫端改用 LLM。
+    """
+
+    def __init__(self, vectorstore, min_score: float, min_margin: float):
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.labels: List[str] = []
+        self._sums: Optional[np.ndarray] = None
+        self._counts: Optional[np.ndarray] = None
+        self._centroids: Optional[np.ndarray] = None
+        self._build(vectorstore)
+
+    def _build(self, vectorstore):
+        index = vectorstore.index
+        if index.ntotal == 0:
+            return
+        vectors = _normalize(index.reconstruct_n(0, index.ntotal).astype(np.float32))
+
+        groups: Dict[str, List[int]] = {}
+        for position, doc_id in vectorstore.index_to_docstore_id.items():
+            doc = vectorstore.docstore.search(doc_id)
+            category = doc.metadata.get("category") if hasattr(doc, "metadata") else None
+            if isinstance(category, str) and category:
+                groups.setdefault(category, []).append(position)
+
+        self.labels = sorted(groups)
+        self._sums = np.stack([vectors[groups[label]].sum(axis=0) for label in self.labels])
+        self._counts = np.array([len(groups[label]) for label in self.labels], dtype=np.float32)
+        self._centroids = _normalize(self._sums / self._counts[:, None])
+        logger.info(f"Category classifier built with {len(self.labels)} categories")
+
+    def scores(self, vector: List[float], exclude: Optional[Tuple[str, np.ndarray]] = None) -> np.ndarray:
+        """
+        查詢向量與各分類質心的 cosine 相似度。
+        exclude=(分類, 向量) 可將某筆資料自質心中扣除 (離線評估 leave-one-out 用)。
+        """
+        query = _normalize(np.asarray(vector, dtype=np.float32))
+        centroids = self._centroids
+        if exclude is not None:
+            label, excluded_vec = exclude
+            i = self.labels.index(label)
+            if self._counts[i] > 1:
+                centroids = centroids.copy()
+                loo = (self._sums[i] - _normalize(np.asarray(excluded_vec, dtype=np.float32))) / (self._counts[i] - 1)
+                centroids[i] = _normalize(loo)
+        return centroids @ query
+
+    def classify(self, query: str, vector: List[float],
+                 exclude: Optional[Tuple[str, np.ndarray]] = None) -> Optional[Tuple[str, float, str]]:
+        """
+        回傳 (分類, 信心分數, 方法)；信心不足時回傳 None
+        """
+        if not self.labels:
+            return None
+
+        keyword_label = categorize_question({"question": query, "answer": ""})
+        if keyword_label != "other" and keyword_label in self.labels:
+            return keyword_label, 1.0, "keyword"
+
+        scores = self.scores(vector, exclude)
+        order = np.argsort(scores)[::-1]
+        best = float(scores[order[0]])
+        margin = best - float(scores[order[1]]) if len(order) > 1 else best
+        if best < self.min_score or margin < self.min_margin:
+            return None
+        return self.labels[order[0]], best, "centroid"
@@ -0,0 +1,100 @@
+import logging
+from typing import Dict, List, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CategorySubIndexes:
+    """
+    分類檢索只掃描該分類的向量，不像 similarity_search(filter=...) 先取回再過濾，
+    小分類也能取得足夠的結果。
+    - Flat 全域索引：每個分類一個獨立的 Flat 子索引 (向量自全域索引精確還原)
+    - HNSW / IVF-PQ：不複製向量也不重新訓練，改以 IDSelector 在全域索引上只檢索該分類，
+      記憶體與啟動時間維持與全域索引一致
+    """
+
+    def __init__(self, vectorstore: FAISS):
+        import faiss
+
+        self._vectorstore = vectorstore
+        # 分類 -> (子索引或 selector, 文件位置)
+        self._entries: Dict[str, Tuple[object, np.ndarray]] = {}
+        index = vectorstore.index
+        self._use_sub_indexes = isinstance(index, faiss.IndexFlat)
+        if index.ntotal == 0:
+            return
+
+        groups: Dict[str, List[int]] = {}
+        for position, doc_id in vectorstore.index_to_docstore_id.items():
+            doc = vectorstore.docstore.search(doc_id)
+            category = doc.metadata.get("category") if hasattr(doc, "metadata") else None
+            if isinstance(category, str) and category:
+                groups.setdefault(category, []).append(position)
+
+        vectors = index.reconstruct_n(0, index.ntotal).astype(np.float32) if self._use_sub_indexes else None
+        for category, positions in groups.items():
+            ids = np.asarray(positions, dtype=np.int64)
+            if self._use_sub_indexes:
+                # 與全域索引相同的 L2 距離，分數可沿用 _select_relevance_score_fn
+                sub_index = faiss.IndexFlatL2(index.d)
+                sub_index.add(vectors[ids])
+                self._entries[category] = (sub_index, ids)
+            else:
+                self._entries[category] = (faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids)), ids)
+        kind = "sub-indexes" if self._use_sub_indexes else "selectors"
+        logger.info(f"Built {len(self._entries)} category {kind}: "
+                    f"{ {c: len(ids) for c, (_, ids) in self._entries.items()} }")
+
+    def __contains__(self, category: str) -> bool:
+        return category in self._entries
+
+    def size(self, category: str) -> int:
+        entry = self._entries.get(category)
+        return len(entry[1]) if entry else 0
+
+    def _search_parameters(self, selector):
+        """依索引類型建立帶 selector 的搜尋參數，efSearch / nprobe 與全域檢索相同"""
+        import faiss
+
+        index = self._vectorstore.index
+        if isinstance(index, faiss.IndexHNSW):
+            params = faiss.SearchParametersHNSW()
+            params.efSearch = settings.HNSW_EF_SEARCH
+        elif isinstance(index, faiss.IndexIVF):
+            params = faiss.SearchParametersIVF()
+            params.nprobe = index.nprobe
+        else:
+            params = faiss.SearchParameters()
+        params.sel = selector
+        return params
+
+    def search(self, category: str, vector: List[float], k: int) -> List[Tuple[Document, float]]:
+        """
+        只檢索該分類，回傳 (文件, 距離)，最多 min(k, 分類大小) 筆。
+        HNSW / IVF 為近似檢索，小分類可能不足 k 筆，由呼叫端以全域結果補足。
+        """
+        entry = self._entries.get(category)
+        if entry is None:
+            return []
+        target, ids = entry
+        query = np.asarray([vector], dtype=np.float32)
+        if self._vectorstore._normalize_L2:
+            query /= np.linalg.norm(query, axis=1, keepdims=True)
+        k = min(k, len(ids))
+        if self._use_sub_indexes:
+            distances, positions = target.search(query, k)
+            positions = [ids[p] if p >= 0 else -1 for p in positions[0]]
+        else:
+            distances, found = self._vectorstore.index.search(query, k, params=self._search_parameters(target))
+            positions = found[0]
+        results = []
+        for distance, position in zip(distances[0], positions):
+            if position < 0:
+                continue
+            doc_id = self._vectorstore.index_to_docstore_id[int(position)]
+            results.append((self._vectorstore.docstore.search(doc_id), float(distance)))
+        return results
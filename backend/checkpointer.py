@@ -0,0 +1,184 @@
+import time
+import logging
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Tuple
+from langgraph.checkpoint.memory import MemorySaver
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINTERS = ("memory", "sqlite")
+
+
+def _nbytes(obj: Any) -> int:
+    """序列化後 checkpoint 資料的概略大小 (bytes)"""
+    if isinstance(obj, (bytes, bytearray, str)):
+        return len(obj)
+    if isinstance(obj, dict):
+        return sum(_nbytes(v) for v in obj.values())
+    if isinstance(obj, (tuple, list)):
+        return sum(_nbytes(v) for v in obj)
+    return 0
+
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    有上限的記憶體 checkpointer：
+    - 每個 thread 只保留最新 max_checkpoints_per_thread 個 checkpoint (及其 writes / blobs)
+    - 閒置超過 ttl_seconds 的 thread 整個移除
+    - thread 數超過 max_threads 時移除最久未使用者 (LRU)
+    """
+
+    def __init__(self, max_threads: int, ttl_seconds: float, max_checkpoints_per_thread: int):
+        super().__init__()
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+        self._access: "OrderedDict[str, float]" = OrderedDict()
+        # (thread_id, checkpoint_ns) -> {checkpoint_id: channel_versions}，以及各 (channel, version) 被保留 checkpoint 參照的次數，
+        # 移除 checkpoint 時只需遞減計數，不必反序列化其餘 checkpoint 或掃描所有 blobs
+        self._checkpoint_versions: Dict[Tuple[str, str], Dict[str, Dict[str, Any]]] = {}
+        self._version_refs: Dict[Tuple[str, str], Counter] = {}
+        self._bound_lock = threading.RLock()
+        self.counters = {"evicted_ttl": 0, "evicted_lru": 0, "pruned_checkpoints": 0}
+
+    def _touch(self, thread_id: str):
+        self._access[thread_id] = time.monotonic()
+        self._access.move_to_end(thread_id)
+
+    def _drop_thread(self, thread_id: str):
+        self._access.pop(thread_id, None)
+        self.storage.pop(thread_id, None)
+        for key in [k for k in self.writes if k[0] == thread_id]:
+            del self.writes[key]
+        blobs = getattr(self, "blobs", None)
+        if blobs:
+            for key in [k for k in blobs if k[0] == thread_id]:
+                del blobs[key]
+        for key in [k for k in self._checkpoint_versions if k[0] == thread_id]:
+            del self._checkpoint_versions[key]
+            self._version_refs.pop(key, None)
+
+    def _evict(self):
+        if self.ttl_seconds > 0:
+            deadline = time.monotonic() - self.ttl_seconds
+            while self._access:
+                thread_id, last_access = next(iter(self._access.items()))
+                if last_access > deadline:
+                    break
+                self._drop_thread(thread_id)
+                self.counters["evicted_ttl"] += 1
+        while self.max_threads > 0 and len(self._access) > self.max_threads:
+            self._drop_thread(next(iter(self._access)))
+            self.counters["evicted_lru"] += 1
+
+    def _track_versions(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str, channel_versions: dict):
+        """記錄新 checkpoint 參照的 channel 版本"""
+        key = (thread_id, checkpoint_ns)
+        versions = dict(channel_versions)
+        self._checkpoint_versions.setdefault(key, {})[checkpoint_id] = versions
+        self._version_refs.setdefault(key, Counter()).update(versions.items())
+
+    def _prune_thread(self, thread_id: str):
+        """移除較舊的 checkpoint，以及不再被保留 checkpoint 參照的 channel blobs"""
+        if self.max_checkpoints_per_thread <= 0:
+            return
+        blobs = getattr(self, "blobs", None)
+        for checkpoint_ns, checkpoints in self.storage.get(thread_id, {}).items():
+            excess = len(checkpoints) - self.max_checkpoints_per_thread
+            if excess <= 0:
+                continue
+            key = (thread_id, checkpoint_ns)
+            tracked = self._checkpoint_versions.get(key, {})
+            refs = self._version_refs.get(key, Counter())
+            # checkpoint id 為依時間遞增的 uuid6
+            for checkpoint_id in sorted(checkpoints)[:excess]:
+                del checkpoints[checkpoint_id]
+                self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+                for version in tracked.pop(checkpoint_id, {}).items():
+                    refs[version] -= 1
+                    if refs[version] <= 0:
+                        del refs[version]
+                        if blobs is not None:
+                            blobs.pop((thread_id, checkpoint_ns, *version), None)
+            self.counters["pruned_checkpoints"] += excess
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        with self._bound_lock:
+            self._evict()
+            result = super().get_tuple(config)
+            if thread_id in self._access:
+                self._touch(thread_id)
+            elif result is None:
+                # storage 為 defaultdict，查詢不存在的 thread 會留下空項目
+                self.storage.pop(thread_id, None)
+            return result
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        with self._bound_lock:
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+            self._track_versions(
+                thread_id,
+                config["configurable"].get("checkpoint_ns", ""),
+                checkpoint["id"],
+                checkpoint.get("channel_versions", {})
+            )
+            self._touch(thread_id)
+            self._prune_thread(thread_id)
+            self._evict()
+            return next_config
+
+    def put_writes(self, *args, **kwargs):
+        with self._bound_lock:
+            return super().put_writes(*args, **kwargs)
+
+    def delete_thread(self, thread_id: str):
+        with self._bound_lock:
+            self._drop_thread(thread_id)
+
+    async def astats(self) -> dict:
+        with self._bound_lock:
+            return {
+                "backend": "memory",
+                "threads": len(self._access),
+                "checkpoints": sum(len(c) for namespaces in self.storage.values() for c in namespaces.values()),
+                "approx_bytes": _nbytes(self.storage) + _nbytes(self.writes) + _nbytes(getattr(self, "blobs", {})),
+                "max_threads": self.max_threads,
+                **self.counters,
+            }
+
+    async def aclose(self):
+        pass
+
+
+async def create_checkpointer():
+    """依 CHECKPOINTER 設定建立 checkpointer (SQLite 需在 event loop 中開啟連線)"""
+    backend = settings.CHECKPOINTER
+    if backend == "sqlite":
+        try:
+            from .sqlite_checkpointer import PruningSqliteSaver
+        except ImportError as e:
+            raise ImportError(
+                "CHECKPOINTER=sqlite requires the sqlite extras: pip install \"langgraph-checkpoint-sqlite\""
+            ) from e
+        return await PruningSqliteSaver.open(
+            settings.get_absolute_checkpoint_db_path(),
+            max_threads=settings.CHECKPOINT_MAX_THREADS,
+            ttl_seconds=settings.CHECKPOINT_THREAD_TTL,
+            max_checkpoints_per_thread=settings.CHECKPOINT_MAX_PER_THREAD,
+            sweep_interval=settings.CHECKPOINT_SWEEP_INTERVAL
+        )
+    if backend == "memory":
+        return create_memory_checkpointer()
+    raise ValueError(f"Unknown CHECKPOINTER: {backend} (expected one of {CHECKPOINTERS})")
+
+
+def create_memory_checkpointer() -> BoundedMemorySaver:
+    return BoundedMemorySaver(
+        max_threads=settings.CHECKPOINT_MAX_THREADS,
+        ttl_seconds=settings.CHECKPOINT_THREAD_TTL,
+        max_checkpoints_per_thread=settings.CHECKPOINT_MAX_PER_THREAD
+    )
@@ -1,4 +1,5 @@
 import os
+from typing import Dict
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -14,16 +15,105 @@ class Settings(BaseSettings):
     OLLAMA_MODEL: str = "ministral-3:3b"
     REWRITER_TEMPERATURE: float = 0.3
     GENERATOR_TEMPERATURE: float = 0.4
+    OLLAMA_KEEP_ALIVE: str = "30m"  # 啟動時預先載入 Ollama 模型並保留於記憶體的時間
+    FUSED_FRONTEND_ENABLED: bool = False  # 以單次 JSON 呼叫合併守衛、改寫與分類
+    SPECULATIVE_FRONTEND_ENABLED: bool = False  # 守衛與改寫/分類/檢索並行 (FUSED 啟用時不生效)
     
     # Retrieval Settings
     EMBEDDING_MODEL: str = "Qwen/Qwen3-Embedding-0.6B"
     RERANKER_MODEL: str = "BAAI/bge-reranker-base"
+    INFERENCE_BACKEND: str = "torch"  # torch | onnx | onnx_int8 (ONNX dynamic int8 量化)
+    INFERENCE_THREADS: int = 0  # Embedding / Reranker CPU 執行緒數，0 表示使用預設值
+    ONNX_QUANTIZATION_CONFIG: str = "avx2"  # arm64 | avx2 | avx512 | avx512_vnni
+    ONNX_MODEL_DIR: str = "backend/data/onnx"  # 量化後模型存放位置
     TOP_K_RETRIEVAL: int = 8
     TOP_N_RERANK: int = 2
     SIMILARITY_THRESHOLD: float = 0.4
+    CATEGORY_SUBINDEX_ENABLED: bool = True  # 分類檢索只掃描該分類：Flat 用獨立子索引、HNSW/IVF-PQ 用 IDSelector (取代 filter 後過濾)
+    HYBRID_SEARCH_ENABLED: bool = True  # 向量檢索搭配 BM25 關鍵字檢索，以 RRF 融合
+    BM25_TOP_K: int = 8  # BM25 取回筆數
+    RRF_K: int = 60  # Reciprocal Rank Fusion 常數
+    RERANK_SCORE_GATE_ENABLED: bool = True  # 依 Reranker 分數略過 clarify 的 LLM 驗證
+    RERANK_ACCEPT_SCORE: float = 0.8  # 最高分高於此值直接生成
+    RERANK_REJECT_SCORE: float = 0.05  # 所有分數低於此值視為無相關資料，不再重試
+    GUARDRAIL_PREFILTER_ENABLED: bool = True  # LLM 守衛前先以關鍵字與知識庫相似度篩選
+    GUARDRAIL_PASS_SIMILARITY: float = 0.6  # 與知識庫相似度高於此值直接放行
+    GUARDRAIL_BLOCK_SIMILARITY: float = 0.2  # 無對話歷史且相似度低於此值直接攔截
+    GUARDRAIL_KEYWORD_PASS_MAX_CHARS: int = 30  # 關鍵字直接放行的問題長度上限 (正規化後字數)
+    LOCAL_CLASSIFIER_ENABLED: bool = True  # 先以本地分類器分類，信心不足才呼叫 LLM
+    LOCAL_CLASSIFIER_MIN_SCORE: float = 0.5  # 最佳分類質心 cosine 相似度下限
+    LOCAL_CLASSIFIER_MIN_MARGIN: float = 0.05  # 第一、二名分數差距下限
+    QUERY_EMBEDDING_CACHE_SIZE: int = 4096  # 查詢向量 LRU 快取筆數
+    RERANK_SCORE_CACHE_SIZE: int = 32768  # (query, 文件) Cross-Encoder 分數 LRU 快取筆數
+    CPU_EXECUTOR_WORKERS: int = 4  # FAISS 檢索 / Rerank 執行緒池大小
+    MODEL_LOAD_WORKERS: int = 4  # 啟動時平行載入模型 / 知識庫的執行緒數
+    STARTUP_WARMUP_ENABLED: bool = True  # 載入後以假資料暖機 Embedding / Reranker，並預先載入 Ollama 模型
+    
+    # FAQ Fast Path Settings
+    FAQ_FAST_PATH_ENABLED: bool = True  # 正規化後與知識庫問題完全相同時直接回答
+    FAQ_FAST_PATH_OPTIMIZE: bool = False  # 直接回答前是否仍經過 LLM 優化
+    LOCAL_OPTIMIZE_ENABLED: bool = True  # 回答通過語言/格式檢查時以本地後處理取代 LLM 優化
+    LOCAL_OPTIMIZE_MIN_CJK_RATIO: float = 0.5  # 中文字比例低於此值時再以 langdetect 確認語言
+    CALCULATOR_FAST_PATH_ENABLED: bool = True  # 試算參數齊全時直接呼叫計算工具，略過 tool-calling 與優化的 LLM 呼叫
+    
+    # Semantic Cache Settings
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95  # cosine 相似度門檻
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 1000
+    SEMANTIC_CACHE_TTL: float = 86400  # 秒
     
     # Data Settings
     DATA_PATH: str = r"backend\data\sample_data.csv"
+    
+    # Index Persistence Settings
+    INDEX_DIR: str = "backend/data/index"
+    INDEX_PERSIST: bool = True  # 將 FAISS 索引寫入磁碟，避免每次啟動重新 embedding
+    INDEX_MMAP: bool = False  # 以 memory-map 方式載入索引 (多 worker 共用分頁)
+    EMBEDDING_CACHE_PATH: str = "backend/data/index/embedding_cache.npz"
+    
+    # ANN Index Settings (大型知識庫用；小型知識庫 Flat 精確檢索即可)
+    INDEX_TYPE: str = "flat"  # flat | hnsw | ivfpq
+    HNSW_M: int = 32  # 每個節點的鄰居數
+    HNSW_EF_CONSTRUCTION: int = 200
+    HNSW_EF_SEARCH: int = 128  # 越大 recall 越高、越慢
+    IVF_NLIST: int = 0  # cluster 數，0 表示 4 * sqrt(N)
+    IVF_NPROBE: int = 16  # 搜尋的 cluster 數，越大 recall 越高、越慢
+    IVF_PQ_M: int = 64  # PQ 子向量數 (會調整為可整除維度的值)
+    IVF_PQ_NBITS: int = 8
+    IVF_TRAIN_SIZE: int = 100000  # 訓練取樣向量數上限
+    
+    # Conversation History Settings
+    HISTORY_SUMMARY_ENABLED: bool = True  # 較舊的對話於背景摺疊為摘要
+    HISTORY_KEEP_TURNS: int = 3  # 最近 N 輪對話保留原文
+    HISTORY_SUMMARY_TRIGGER_TOKENS: int = 800  # 可摺疊的較舊對話超過此 token 數才產生摘要
+    # 各節點送入 LLM 的對話歷史 token 上限 (估計值)，0 表示不限制
+    HISTORY_TOKEN_BUDGETS: Dict[str, int] = {
+        "guardrail": 300,
+        "fused_frontend": 600,
+        "rewrite": 600,
+        "generate": 2000,
+    }
+    
+    # Conversation Checkpointer Settings
+    CHECKPOINTER: str = "memory"  # memory (有上限的 LRU + TTL) | sqlite (WAL，重啟後保留、多 worker 共用)
+    CHECKPOINT_DB_PATH: str = "backend/data/checkpoints.sqlite"
+    CHECKPOINT_MAX_THREADS: int = 1000  # 保留的對話 thread 數上限，超過時移除最久未使用者
+    CHECKPOINT_THREAD_TTL: float = 86400  # thread 閒置超過此秒數即移除
+    CHECKPOINT_MAX_PER_THREAD: int = 20  # 每個 thread 保留的 checkpoint 數 (每個節點步驟產生一個)
+    CHECKPOINT_SWEEP_INTERVAL: float = 60  # SQLite 過期 thread 清理間隔 (秒)
+    
+    # Knowledge Base Reload Settings
+    KB_WATCH_ENABLED: bool = False  # 監看 DATA_PATH，變更時自動熱更新
+    KB_WATCH_INTERVAL: float = 5.0  # 秒
+    ADMIN_TOKEN: str = ""  # 管理端點需帶 X-Admin-Token 標頭；空字串表示不驗證
+    
+    # Observability Settings
+    METRICS_ENABLED: bool = True  # 節點計時並於 /metrics 提供 Prometheus 格式 metrics
+    TRACE_ENABLED: bool = False  # 每個節點 / 模型呼叫寫入一筆 JSONL span (scripts/analyze_traces.py 分析)
+    TRACE_LOG_PATH: str = "backend/data/traces/trace.jsonl"
+    TRACE_MAX_BYTES: int = 50 * 1024 * 1024  # 單一檔案上限，超過即輪替
+    TRACE_BACKUP_COUNT: int = 5
+    TRACE_QUEUE_SIZE: int = 10000  # 寫入佇列上限，滿時丟棄 span 而不阻塞請求
 
     model_config = SettingsConfigDict(
         env_file=".env", 
@@ -38,4 +128,34 @@ class Settings(BaseSettings):
         # Access the project root (assuming we run from root)
         return os.path.abspath(self.DATA_PATH)
 
+    def get_absolute_index_dir(self) -> str:
+        """Returns the absolute path to the persisted index directory."""
+        if os.path.isabs(self.INDEX_DIR):
+            return self.INDEX_DIR
+        return os.path.abspath(self.INDEX_DIR)
+
+    def get_absolute_onnx_model_dir(self) -> str:
+        """Returns the absolute path to the exported ONNX model directory."""
+        if os.path.isabs(self.ONNX_MODEL_DIR):
+            return self.ONNX_MODEL_DIR
+        return os.path.abspath(self.ONNX_MODEL_DIR)
+
+    def get_absolute_checkpoint_db_path(self) -> str:
+        """Returns the absolute path to the checkpointer SQLite database."""
+        if os.path.isabs(self.CHECKPOINT_DB_PATH):
+            return self.CHECKPOINT_DB_PATH
+        return os.path.abspath(self.CHECKPOINT_DB_PATH)
+
+    def get_absolute_embedding_cache_path(self) -> str:
+        """Returns the absolute path to the embedding cache file."""
+        if os.path.isabs(self.EMBEDDING_CACHE_PATH):
+            return self.EMBEDDING_CACHE_PATH
+        return os.path.abspath(self.EMBEDDING_CACHE_PATH)
+
+    def get_absolute_trace_log_path(self) -> str:
+        """Returns the absolute path to the JSONL trace log."""
+        if os.path.isabs(self.TRACE_LOG_PATH):
+            return self.TRACE_LOG_PATH
+        return os.path.abspath(self.TRACE_LOG_PATH)
+
 settings = Settings()
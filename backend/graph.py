@@ -1,16 +1,36 @@
 from langgraph.graph import StateGraph, END, START
 from langgraph.prebuilt import ToolNode, tools_condition
-from langgraph.checkpoint.memory import MemorySaver
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from langchain_ollama import ChatOllama
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableConfig
 from langdetect import detect
 import json
+import time
+import asyncio
 import logging
-from typing import Literal
-from .models import GraphState
+from typing import Dict, Literal
+from pydantic import ValidationError
+from .models import GraphState, FrontEndDecision, QUERY_CATEGORIES
 from .rag_engine import RAGComponents
+from .guardrail import GuardrailPrefilter
+from .checkpointer import create_memory_checkpointer
+from .lru_cache import LRUCache
+from .calculator import try_calculate, history_queries
+from .postprocess import postprocess_answer, OptimizerStats
+from .metrics import instrument_node, REWRITE_RETRIES, TOOL_CALLS
+from .tracing import annotate, doc_ids
+from .history import (
+    estimate_tokens,
+    message_tokens,
+    render_message,
+    fold_boundary,
+    fit_history,
+    select_recent_messages,
+    TokenUsageStats,
+    TokenUsageCallbackHandler
+)
 from .config import settings
 import opencc
 from .prompts import (
@@ -20,7 +40,9 @@ from .prompts import (
     REWRITE_PROMPT_NORMAL,
     GENERATE_SYSTEM_PROMPT,
     GUARDRAIL_PROMPT,
-    OPTIMIZE_RESPONSE_PROMPT
+    OPTIMIZE_RESPONSE_PROMPT,
+    FUSED_FRONTEND_PROMPT,
+    HISTORY_SUMMARY_PROMPT
 )
 
 
@@ -28,6 +50,8 @@ logger = logging.getLogger(__name__)
 
 class GraphBuilder:
     def __init__(self, rag_components):
+        from langchain_ollama import ChatOllama
+
         self.rag_engine = rag_components
         self.model = ChatOllama(
             model=settings.OLLAMA_MODEL, 
@@ -50,71 +74,184 @@ class GraphBuilder:
         guardrail_prompt = ChatPromptTemplate.from_template(GUARDRAIL_PROMPT)
         self.guardrail_chain = guardrail_prompt | self.model | StrOutputParser()
         
+        # Fused Front-end Chain (Guardrail + Rewrite + Classification in one call)
+        fused_prompt = ChatPromptTemplate.from_template(FUSED_FRONTEND_PROMPT)
+        self.fused_frontend_chain = fused_prompt | self.model | StrOutputParser()
+        
         # Optimization Chain
         optimization_prompt = ChatPromptTemplate.from_template(OPTIMIZE_RESPONSE_PROMPT)
         self.optimization_chain = optimization_prompt | self.model | StrOutputParser()
         
         # Initialize OpenCC for Simplified to Traditional conversion
         self.cc = opencc.OpenCC('s2t')
+        
+        # 本地守衛前置篩選 (分層計數)
+        self.guardrail_prefilter = GuardrailPrefilter(
+            pass_similarity=settings.GUARDRAIL_PASS_SIMILARITY,
+            block_similarity=settings.GUARDRAIL_BLOCK_SIMILARITY,
+            keyword_pass_max_chars=settings.GUARDRAIL_KEYWORD_PASS_MAX_CHARS
+        )
+        
+        # 推測執行統計 (相對於依序執行守衛、改寫+分類、檢索所節省的延遲)
+        self.speculation_stats = {
+            "requests": 0,
+            "blocked_discarded": 0,
+            "saved_ms_total": 0.0,
+            "last_saved_ms": 0.0,
+        }
+        
+        # 試算快速路徑統計 (hits: 直接計算；fallbacks: 參數不足或不明確，交給 LLM)
+        self.calculator_stats = {"hits": 0, "fallbacks": 0}
+        
+        # 回答優化統計 (本地後處理略過 LLM 的次數)
+        self.optimizer_stats = OptimizerStats()
+        
+        # 各節點 LLM prompt token 統計
+        self.token_usage = TokenUsageStats()
+        # 背景產生的對話摘要：thread_id -> (摺疊到的訊息位置, 摘要)
+        self.history_summaries = LRUCache(settings.CHECKPOINT_MAX_THREADS)
+        self._summary_tasks: Dict[str, asyncio.Task] = {}
     
-    def _format_messages_to_str(self, messages) -> str:
+    def _format_messages_to_str(self, messages, exclude_current: bool = True) -> str:
         """Helper to format messages into a string history for rewriter/generator"""
-        history_str = ""
         # 排除最後一條 HumanMessage，因為它通常是當前正在處理的問題
         # 這樣可以避免 rewriter 看到重複的問題
-        msgs_to_process = messages[:-1] if messages and isinstance(messages[-1], HumanMessage) else messages
-        
-        for msg in msgs_to_process:
-            if isinstance(msg, HumanMessage):
-                history_str += f"Human: {msg.content}\n"
-            elif isinstance(msg, SystemMessage):
-                continue
-            elif hasattr(msg, '__class__') and msg.__class__.__name__ == 'ToolMessage':
-                # 將工具結果摘要加入歷史，有助於上下文理解
-                content = str(msg.content)
-                if len(content) > 100:
-                    content = content[:100] + "..."
-                history_str += f"System (Tool Result): {content}\n"
-            else:
-                # AI Message
-                if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                    # 如果 AI 調用了工具，記錄一下調用的動作
-                    tool_names = [tc.get('name') for tc in msg.tool_calls]
-                    history_str += f"AI (Action): 調用了工具 {', '.join(tool_names)}\n"
-                
-                if msg.content:
-                    history_str += f"AI: {msg.content}\n"
-    
-        return history_str.strip()
+        if exclude_current and messages and isinstance(messages[-1], HumanMessage):
+            messages = messages[:-1]
+        return "\n".join(line for line in map(render_message, messages) if line).strip()
+
+    @staticmethod
+    def _history_end(messages) -> int:
+        """對話歷史的結尾位置 (排除目前正在處理的 HumanMessage)"""
+        return len(messages) - 1 if messages and isinstance(messages[-1], HumanMessage) else len(messages)
+
+    def _history_for(self, state: GraphState, node: str) -> str:
+        """
+        節點用的對話歷史：摘要 + 尚未摺疊的對話原文，限制在該節點的 token 預算內。
+        使用 initialize 時追加的 history_lines，不重新呈現整個 thread。
+        """
+        messages = state.get("messages", [])
+        lines = state.get("history_lines") or []
+        end = self._history_end(messages)
+        if len(lines) < end:
+            # 直接呼叫節點 (未經 initialize) 時補上缺少的部分
+            lines = list(lines) + [render_message(m) for m in messages[len(lines):end]]
+        return fit_history(
+            state.get("history_summary") or "",
+            lines,
+            settings.HISTORY_TOKEN_BUDGETS.get(node, 0),
+            start=state.get("summarized_count") or 0,
+            end=end
+        )
 
-    def initialize_conversation(self, state: GraphState) -> GraphState:
+    def _apply_history_summary(self, state: GraphState, config: RunnableConfig) -> dict:
+        """將背景完成、且比狀態中更新的摘要寫入狀態"""
+        thread_id = (config or {}).get("configurable", {}).get("thread_id")
+        cached = self.history_summaries.get(thread_id) if thread_id else None
+        if cached is None:
+            return {}
+        end, summary = cached
+        if (state.get("summarized_count") or 0) < end <= len(state.get("messages", [])):
+            logger.info(f"Applying history summary (folded {end} messages)")
+            return {"history_summary": summary, "summarized_count": end}
+        return {}
+
+    def _schedule_history_summary(self, state: GraphState, config: RunnableConfig):
+        """
+        回答完成後，若較舊 (最近 HISTORY_KEEP_TURNS 輪以前) 的對話超過門檻，
+        於背景產生摘要，不佔用本次請求的延遲；下一輪於 initialize 時套用。
+        """
+        if not settings.HISTORY_SUMMARY_ENABLED:
+            return
+        thread_id = (config or {}).get("configurable", {}).get("thread_id")
+        if not thread_id or thread_id in self._summary_tasks:
+            return
+        
+        messages = list(state.get("messages", []))
+        start = state.get("summarized_count") or 0
+        summary = state.get("history_summary") or ""
+        cached = self.history_summaries.get(thread_id)
+        if cached is not None and start < cached[0] <= len(messages):
+            start, summary = cached
+        
+        end = fold_boundary(messages, start, settings.HISTORY_KEEP_TURNS)
+        older = messages[start:end]
+        if not older or sum(message_tokens(m) for m in older) < settings.HISTORY_SUMMARY_TRIGGER_TOKENS:
+            return
+        
+        task = asyncio.create_task(self._summarize_history(thread_id, summary, older, end))
+        self._summary_tasks[thread_id] = task
+        task.add_done_callback(lambda _: self._summary_tasks.pop(thread_id, None))
+
+    def _usage_config(self, node: str, history_tokens: int = 0) -> RunnableConfig:
+        """單次 LLM 呼叫的 config：以 callback 記錄實際 (或估計) 的 prompt / completion token 數"""
+        return {"callbacks": [TokenUsageCallbackHandler(self.token_usage, node, history_tokens)]}
+
+    async def _summarize_history(self, thread_id: str, summary: str, messages: list, end: int):
+        try:
+            prompt = HISTORY_SUMMARY_PROMPT.format(
+                summary=summary if summary else "無",
+                history_str=self._format_messages_to_str(messages, exclude_current=False)
+            )
+            summarizer = self.rag_engine.llm_rewriter.with_config(self._usage_config("summarize"))
+            new_summary = self.cc.convert((await summarizer.ainvoke(prompt)).strip())
+            self.history_summaries.put(thread_id, (end, new_summary))
+            logger.info(f"History summarized for thread {thread_id}: {len(messages)} messages folded")
+        except Exception as e:
+            logger.warning(f"History summarization failed (keeping verbatim history): {e}")
+
+    async def initialize_conversation(self, state: GraphState, config: RunnableConfig) -> GraphState:
         """節點 0: 初始化對話，將用戶新問題加入 messages"""
         logger.info("Checking conversation initialization...")
         original_query = state["original_query"]
         messages = state.get("messages", [])
         
+        summary_update = self._apply_history_summary(state, config)
+        
+        # 只呈現上一輪以來新增的訊息，追加到 history_lines
+        rendered = len(state.get("history_lines") or [])
+        
         # 檢查最後一條訊息是否已經是這個問題（避免重複添加）
         if not messages or (isinstance(messages[-1], HumanMessage) and messages[-1].content != original_query) or not isinstance(messages[-1], HumanMessage):
              logger.info(f"Adding new user query to messages: {original_query[:50]}...")
              return {
-                "messages": [HumanMessage(content=original_query)]
+                "messages": [HumanMessage(content=original_query)],
+                "history_lines": [render_message(m) for m in messages[rendered:]],
+                **summary_update
             }
         
         logger.info(f"Question already in messages, skipping duplication")
-        return {"messages": []}
+        return {
+            "messages": [],
+            "history_lines": [render_message(m) for m in messages[rendered:-1]],
+            **summary_update
+        }
 
-    def guardrail_node(self, state: GraphState) -> GraphState:
+    async def guardrail_node(self, state: GraphState) -> GraphState:
         """節點 0.5: 路由守衛（LLM 篩選）"""
         logger.info("Executing router guardrail (LLM)...")
         query = state["original_query"]
-        messages = state.get("messages", [])
         
         # 準備對話歷史概要
-        history_str = self._format_messages_to_str(messages)
+        history_str = self._history_for(state, "guardrail")
+        
+        if settings.GUARDRAIL_PREFILTER_ENABLED:
+            tier = await self._prefilter_guardrail(query, has_history=bool(history_str))
+            if tier is not None:
+                self.guardrail_prefilter.record(tier)
+                logger.info(f"Guard decision (prefilter {tier})")
+                if tier == "embedding_block":
+                    return {
+                        "error": "blocked",
+                        "final_answer": "抱歉，我只能回答與請假或差勤相關的問題。"
+                    }
+                return {"error": "pass"}
+            self.guardrail_prefilter.record("llm")
         
         # 調用 LLM 判斷
         try:
-            response = self.guardrail_chain.invoke({
+            chain = self.guardrail_chain.with_config(self._usage_config("guardrail", estimate_tokens(history_str)))
+            response = await chain.ainvoke({
                 "history_str": history_str if history_str else "無先前對話",
                 "query": query
             })
@@ -139,6 +276,22 @@ class GraphBuilder:
         logger.info("Request passed")
         return {"error": "pass"}
     
+    async def _prefilter_guardrail(self, query: str, has_history: bool):
+        """本地分層篩選：規則 -> 知識庫相似度，不確定時回傳 None"""
+        tier = self.guardrail_prefilter.match_rules(query)
+        if tier is not None:
+            return tier
+        if self.guardrail_prefilter.requires_llm(query):
+            # 與知識庫相似也可能是夾帶業務詞的注入，不以相似度放行
+            return None
+        try:
+            similarity = await self.rag_engine.akb_similarity(query)
+        except Exception as e:
+            logger.warning(f"Guard prefilter similarity failed, deferring to LLM: {e}")
+            return None
+        logger.debug(f"Guard prefilter KB similarity: {similarity:.3f}")
+        return self.guardrail_prefilter.judge_similarity(similarity, has_history)
+    
     def check_guardrail(self, state: GraphState) -> Literal["continue", "end"]:
         """條件判斷: 守衛攔截結果"""
         error = state.get("error")
@@ -146,7 +299,109 @@ class GraphBuilder:
             return "end"
         return "continue"
 
-    def rewrite_node(self, state: GraphState) -> GraphState:
+    async def fused_frontend_node(self, state: GraphState) -> GraphState:
+        """節點 0.5 (合併模式): 一次 LLM 呼叫完成守衛、改寫與分類"""
+        logger.info("Executing fused front-end (guardrail + rewrite + classify)...")
+        query = state["original_query"]
+        history_str = self._history_for(state, "fused_frontend")
+        
+        try:
+            chain = self.fused_frontend_chain.with_config(self._usage_config("fused_frontend", estimate_tokens(history_str)))
+            response = await chain.ainvoke({
+                "history_str": history_str if history_str else "無先前對話",
+                "query": query
+            })
+            result = FrontEndDecision.model_validate_json(response)
+            if result.decision == "allowed" and not result.rewritten_query.strip():
+                raise ValueError("Missing rewritten_query")
+        except (ValidationError, ValueError) as e:
+            logger.warning(f"Fused front-end output invalid, falling back to separate nodes: {e}")
+            return {"error": "fused_fallback"}
+        except Exception as e:
+            logger.error(f"Fused front-end error, falling back to separate nodes: {e}")
+            return {"error": "fused_fallback"}
+        
+        logger.info(f"Guard decision: {result.decision} ({result.reason})")
+        if result.decision == "blocked":
+            logger.warning(f"Request blocked: {result.response}")
+            return {
+                "error": "blocked",
+                "final_answer": result.response if result.response else "抱歉，我只能回答與請假或差勤相關的問題。"
+            }
+        
+        rewritten = result.rewritten_query.strip()
+        logger.info(f"Rewritten query: {rewritten}")
+        logger.info(f"Classification: {result.category}")
+        return {
+            "error": "pass",
+            "rewritten_query": rewritten,
+            "category": result.category,
+            "retry_count": state.get("retry_count", 0) + 1
+        }
+    
+    def check_fused_frontend(self, state: GraphState) -> Literal["continue", "fallback", "end"]:
+        """條件判斷: 合併前置處理結果"""
+        error = state.get("error")
+        if error == "blocked":
+            return "end"
+        if error == "fused_fallback":
+            return "fallback"
+        return "continue"
+
+    async def speculative_frontend_node(self, state: GraphState) -> GraphState:
+        """
+        節點 0.5 (推測模式): 守衛 與 改寫+分類+檢索 兩條路徑並行執行，
+        守衛攔截時捨棄推測結果。檢索使用與依序模式相同的改寫問題與分類，
+        retrieve_node 直接沿用結果，不會多一次檢索，答案也與依序模式相同。
+        """
+        logger.info("Executing speculative front-end (guardrail || rewrite+classify+retrieve)...")
+        wall_start = time.perf_counter()
+        
+        async def timed(coro):
+            start = time.perf_counter()
+            result = await coro
+            return result, time.perf_counter() - start
+        
+        async def rewrite_classify_retrieve():
+            rewrite_result = await self.rewrite_node(state)
+            classify_result = await self.classify_query({**state, **rewrite_result})
+            docs = await self.rag_engine.asearch(
+                rewrite_result["rewritten_query"], category=classify_result.get("category", "other")
+            )
+            return {**rewrite_result, **classify_result, "speculative_docs": docs}
+        
+        guard_task = asyncio.create_task(timed(self.guardrail_node(state)))
+        frontend_task = asyncio.create_task(timed(rewrite_classify_retrieve()))
+        
+        guard_result, guard_time = await guard_task
+        self.speculation_stats["requests"] += 1
+        
+        if guard_result.get("error") == "blocked":
+            frontend_task.cancel()
+            await asyncio.gather(frontend_task, return_exceptions=True)
+            self.speculation_stats["blocked_discarded"] += 1
+            logger.info("Guardrail blocked, speculative work discarded")
+            return guard_result
+        
+        frontend_result, frontend_time = await frontend_task
+        
+        wall_time = time.perf_counter() - wall_start
+        # 依序路徑為 守衛 -> 改寫+分類 -> 檢索，三者皆被取代
+        saved_ms = max(0.0, (guard_time + frontend_time - wall_time) * 1000)
+        self.speculation_stats["saved_ms_total"] += saved_ms
+        self.speculation_stats["last_saved_ms"] = saved_ms
+        logger.info(
+            f"Speculative front-end finished in {wall_time * 1000:.0f}ms "
+            f"(guardrail {guard_time * 1000:.0f}ms, rewrite+classify+retrieve {frontend_time * 1000:.0f}ms, "
+            f"saved {saved_ms:.0f}ms)"
+        )
+        
+        return {
+            **frontend_result,
+            "error": "pass"
+        }
+
+    async def rewrite_node(self, state: GraphState) -> GraphState:
         """節點 1: 查詢重寫（支援多輪對話上下文）"""
         logger.info("Executing query rewrite...")
         query = state["original_query"]
@@ -154,14 +409,15 @@ class GraphBuilder:
         
         # 取得對話歷史
         messages = state.get("messages", [])
-        history_str = self._format_messages_to_str(messages)
+        history_str = self._history_for(state, "rewrite")
         
-        # 🔍 調試輸出：檢查是否有歷史
-        logger.debug(f"History status - Messages: {len(messages)}, History len: {len(history_str)}")
-        if history_str:
-            logger.debug(f"History content: {history_str}")
-        else:
-            logger.debug("No history (likely first turn)")
+        # 🔍 調試輸出：檢查是否有歷史 (只在 debug 等級時組字串)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"History status - Messages: {len(messages)}, History len: {len(history_str)}")
+            if history_str:
+                logger.debug(f"History content: {history_str}")
+            else:
+                logger.debug("No history (likely first turn)")
         
         # 根據重試次數選擇提示詞
         if retry_count > 0:
@@ -176,7 +432,8 @@ class GraphBuilder:
                 query=query
             )
         
-        rewritten = self.rag_engine.llm_rewriter.invoke(prompt).strip()
+        rewriter = self.rag_engine.llm_rewriter.with_config(self._usage_config("rewrite", estimate_tokens(history_str)))
+        rewritten = (await rewriter.ainvoke(prompt)).strip()
         
         logger.info(f"Original query: {query}")
         logger.info(f"Rewritten query: {rewritten}")
@@ -187,13 +444,22 @@ class GraphBuilder:
             "retry_count": retry_count + 1
         }
     
-    def classify_query(self, state: GraphState) -> GraphState:
+    async def classify_query(self, state: GraphState) -> GraphState:
         """節點 2: 查詢分類"""
         logger.info("Executing query classification...")
         original_query = state["original_query"]
         query_to_classify = state.get("rewritten_query") or original_query
         
-        response = self.classification_chain.invoke({"question": query_to_classify})
+        if settings.LOCAL_CLASSIFIER_ENABLED:
+            local_result = await self.rag_engine.aclassify_category(query_to_classify)
+            if local_result is not None:
+                category, confidence, method = local_result
+                logger.info(f"Classification (local {method}, {confidence:.2f}): {category}")
+                return {"category": category}
+            logger.info("Local classifier not confident, falling back to LLM")
+        
+        chain = self.classification_chain.with_config(self._usage_config("classify_query"))
+        response = await chain.ainvoke({"question": query_to_classify})
         
         try:
             category_data = json.loads(response)
@@ -201,6 +467,9 @@ class GraphBuilder:
         except json.JSONDecodeError:
             logger.warning(f"Failed to parse classification JSON: {response}")
             category = "other"
+        if category not in QUERY_CATEGORIES:
+            logger.warning(f"Unknown category from LLM: {category}, using 'other'")
+            category = "other"
         
         logger.info(f"Original query: {original_query}")
         logger.info(f"Classification: {category}")
@@ -208,31 +477,41 @@ class GraphBuilder:
         return {"category": category}
 
     
-    def retrieve_node(self, state: GraphState) -> GraphState:
+    async def retrieve_node(self, state: GraphState) -> GraphState:
         """節點 3: 文件檢索"""
         logger.info("Executing document retrieval...")
         query = state["rewritten_query"]
         category = state.get("category", "other")
         
-        retrieved_docs = self.rag_engine.search(query, category=category)
+        # 推測執行時已以相同的改寫問題與分類檢索 (僅第一輪，重試時已清空)
+        retrieved_docs = state.get("speculative_docs") or []
+        if retrieved_docs:
+            logger.info(f"Using {len(retrieved_docs)} speculatively retrieved documents")
+        else:
+            retrieved_docs = await self.rag_engine.asearch(query, category=category)
         
-        return {"retrieved_docs": retrieved_docs}
+        return {"retrieved_docs": retrieved_docs, "speculative_docs": []}
     
-    def rerank_node(self, state: GraphState) -> GraphState:
+    async def rerank_node(self, state: GraphState) -> GraphState:
         """節點 4: 檢索重排序"""
         logger.info("Executing reranking...")
         query = state["rewritten_query"]
         docs = state.get("retrieved_docs", [])
         
         # 針對檢索到的問題與使用者問題進行rerank
-        reranked_docs = self.rag_engine.rerank(docs, query)
+        ranked_docs, rerank_scores = await self.rag_engine.arerank(docs, query)
         
-        # 附加答案到檢索到的問題
+        # 附加答案到檢索到的問題 (建立副本，避免修改知識庫中共用的文件物件)
+        reranked_docs = []
         context_parts = []
-        for i, doc in enumerate(reranked_docs, start=1):
+        for i, doc in enumerate(ranked_docs, start=1):
             question = doc.page_content.replace('問題:', '').strip()
             answer = doc.metadata.get("answer", "")
-            doc.page_content = f"問題: {question}\n答案: {answer}"
+            reranked_docs.append(Document(
+                id=doc.id,
+                page_content=f"問題: {question}\n答案: {answer}",
+                metadata=doc.metadata
+            ))
             
             context_parts.append(
                 f"第{i}名相關文件:\n問題: {question}\n答案: {answer}"
@@ -240,13 +519,39 @@ class GraphBuilder:
         
         context = "\n\n".join(context_parts)
         logger.debug(f"Context length: {len(context)}")
+        annotate(doc_ids=doc_ids(reranked_docs), scores=[round(score, 4) for score in rerank_scores])
         
         return {
             "reranked_docs": reranked_docs,
+            "rerank_scores": rerank_scores,
             "context": context
         }
     
-    def clarify_node(self, state: GraphState) -> GraphState:
+    def gate_by_rerank_score(self, state: GraphState) -> Literal["generate", "clarify", "no_context"]:
+        """條件判斷: 依 Reranker 分數決定是否需要 LLM 驗證"""
+        scores = state.get("rerank_scores") or []
+        if not settings.RERANK_SCORE_GATE_ENABLED or not scores:
+            return "clarify"
+        
+        top_score = max(scores)
+        if top_score >= settings.RERANK_ACCEPT_SCORE:
+            logger.info(f"Rerank score {top_score:.3f} above accept threshold, skipping verification")
+            return "generate"
+        if top_score < settings.RERANK_REJECT_SCORE:
+            logger.info(f"All rerank scores below {settings.RERANK_REJECT_SCORE}, no relevant context")
+            return "no_context"
+        return "clarify"
+    
+    async def no_context_node(self, state: GraphState) -> GraphState:
+        """節點: 檢索結果皆不相關，清空 context 直接生成 (不再重寫重試)"""
+        logger.info("Dropping irrelevant context, proceeding to generation without it")
+        return {
+            "reranked_docs": [],
+            "context": "",
+            "error": "no_content"
+        }
+    
+    async def clarify_node(self, state: GraphState) -> GraphState:
         """節點 5: 檢索結果驗證"""
         logger.info("Executing retrieval verification...")
         original_query = state["original_query"]
@@ -256,10 +561,11 @@ class GraphBuilder:
             logger.warning("No context found, defaulting to fail")
             return {"error": "no_content"}
             
-        decision = self.clarification_chain.invoke({
+        chain = self.clarification_chain.with_config(self._usage_config("clarify"))
+        decision = (await chain.ainvoke({
             "question": original_query, 
             "context": context
-        }).strip().lower()
+        })).strip().lower()
         
         if "yes" in decision:
             decision = "yes"
@@ -270,56 +576,59 @@ class GraphBuilder:
         
         return {"error": decision} 
     
-    def generate_node(self, state: GraphState) -> GraphState:
+    async def generate_node(self, state: GraphState) -> GraphState:
         """節點 4: 答案生成 (支援 Tool Call)"""
         logger.info("Generating answer or calling tools...")
         
         messages = state.get("messages", [])
         logger.debug(f"Current messages count: {len(messages)}")
         
-        # 打印訊息摘要
-        for i, msg in enumerate(messages):
-            msg_type = type(msg).__name__
-            if isinstance(msg, HumanMessage):
-                preview = f"Q: {msg.content[:50]}..."
-            elif isinstance(msg, SystemMessage):
-                preview = "[System]"
-            elif hasattr(msg, 'tool_calls') and msg.tool_calls:
-                preview = f"[Tool Call: {len(msg.tool_calls)}]"
-            elif hasattr(msg, '__class__') and msg.__class__.__name__ == 'ToolMessage':
-                preview = f"[Tool Result: {str(msg.content)[:50]}...]"
-            else:
-                preview = f"A: {str(msg.content)[:50]}..."
-            logger.debug(f"  [{i}] {msg_type}: {preview}")
+        annotate(messages=len(messages))
         
-        # 取得歷史對話字串（用於構建新的系統提示）
-        history_str = self._format_messages_to_str(messages)
+        # 試算快速路徑：本輪第一次生成且參數齊全時直接呼叫計算工具
+        if (settings.CALCULATOR_FAST_PATH_ENABLED and state.get("tool_call_count", 0) == 0
+                and messages and isinstance(messages[-1], HumanMessage)):
+            answer = try_calculate(state["original_query"], history_queries(messages))
+            if answer is not None:
+                self.calculator_stats["hits"] += 1
+                return {
+                    "messages": [AIMessage(content=answer)],
+                    "final_answer": answer,
+                    "fast_path": "calculator"
+                }
+            self.calculator_stats["fallbacks"] += 1
         
         # 建立系統提示詞
         system_prompt = GENERATE_SYSTEM_PROMPT.format(
             context=state.get('context')
         )
+        # 較舊的對話以摘要取代
+        summary = state.get("history_summary")
+        if summary:
+            system_prompt += f"\n\n先前對話摘要：\n{summary}"
         
         # 🔑 構建要發送給 LLM 的訊息列表
         # 策略：始終在最前面放置最新的 SystemMessage
         llm_messages = [SystemMessage(content=system_prompt)]
         
-        # 然後加入所有非 SystemMessage 的訊息
-        for msg in messages:
-            if not isinstance(msg, SystemMessage):
-                llm_messages.append(msg)
+        # 然後加入尚未摺疊進摘要、且在 token 預算內的最近幾輪 (非 SystemMessage) 訊息
+        recent = select_recent_messages(
+            messages,
+            settings.HISTORY_TOKEN_BUDGETS.get("generate", 0),
+            start=state.get("summarized_count") or 0
+        )
+        llm_messages.extend(recent)
         
         logger.debug(f"Calling LLM with {len(llm_messages)} messages")
         
-        # 呼叫 LLM
-        response = self.rag_engine.llm_generator.invoke(llm_messages)
+        # 呼叫 LLM (token 數由 callback 記錄)
+        history_tokens = sum(message_tokens(m) for m in recent)
+        generator = self.rag_engine.llm_generator.with_config(self._usage_config("generate", history_tokens))
+        response = await generator.ainvoke(llm_messages)
         
-        logger.debug(f"LLM Response type: {type(response).__name__}")
-        logger.debug(f"Content preview: {response.content[:150] if response.content else 'None'}...")
         if response.tool_calls:
             logger.info(f"Tool calls detected: {len(response.tool_calls)}")
-            for tc in response.tool_calls:
-                logger.debug(f"  - {tc.get('name', 'unknown')}")
+            annotate(tool_calls=[tc.get("name", "unknown") for tc in response.tool_calls])
         
         # 只返回新的 response，add_messages 會自動追加
         return {
@@ -328,9 +637,10 @@ class GraphBuilder:
         }
 
 
-    def increment_tool_count(self, state: GraphState) -> GraphState:
+    async def increment_tool_count(self, state: GraphState) -> GraphState:
         """在工具執行後增加計數"""
         tool_call_count = state.get("tool_call_count", 0) + 1
+        TOOL_CALLS.inc()
         logger.info(f"Tool execution completed, count: {tool_call_count}")
         return {"tool_call_count": tool_call_count}
         
@@ -341,6 +651,7 @@ class GraphBuilder:
         
         if decision == "no" and retry_count < 3:
             logger.info("Retrieval validation failed, returning to Rewrite...")
+            REWRITE_RETRIES.inc()
             return "rewrite"
         else:
             if decision == "no":
@@ -380,9 +691,15 @@ class GraphBuilder:
             logger.info("No tool calls, generation complete, proceeding to optimization")
             return "optimize"
 
-    def optimize_response_node(self, state: GraphState) -> GraphState:
+    async def optimize_response_node(self, state: GraphState, config: RunnableConfig) -> GraphState:
         """節點: 回答優化 (格式、語言、結尾)"""
         logger.info("Executing response optimization...")
+        self._schedule_history_summary(state, config)
+        
+        if state.get("fast_path") == "calculator":
+            # 固定格式的試算回答已包含問候與結尾，不需 LLM 優化
+            logger.info("Calculator fast path answer, skipping optimization")
+            return {}
         
         final_answer = state.get("final_answer")
         
@@ -396,8 +713,23 @@ class GraphBuilder:
              logger.warning("No answer to optimize.")
              return {}
 
+        return {"final_answer": await self.optimize_answer(final_answer)}
+
+    async def optimize_answer(self, answer: str) -> str:
+        """
+        優化回答 (格式、語言、結尾)：語言與格式檢查通過時只做本地後處理，
+        未通過 (例如 langdetect 判定非中文、含亂碼) 才以 optimization_chain 重新生成。
+        """
+        if settings.LOCAL_OPTIMIZE_ENABLED:
+            optimized, reason = postprocess_answer(answer, self.cc, settings.LOCAL_OPTIMIZE_MIN_CJK_RATIO)
+            self.optimizer_stats.record(reason)
+            if optimized is not None:
+                logger.info("Response optimized locally, skipping LLM optimizer")
+                return optimized
+            logger.info(f"Local optimization check failed ({reason}), using LLM optimizer")
         try:
-            response = self.optimization_chain.invoke({"answer": final_answer})
+            chain = self.optimization_chain.with_config(self._usage_config("optimize_response"))
+            response = await chain.ainvoke({"answer": answer})
             
             # Parse JSON response
             try:
@@ -417,34 +749,69 @@ class GraphBuilder:
             optimized_answer = self.cc.convert(optimized_answer)
 
             logger.info("Response optimized successfully.")
-            return {"final_answer": optimized_answer}
+            return optimized_answer
         except Exception as e:
             logger.error(f"Optimization failed: {e}")
-            return {"final_answer": final_answer + "\n\n若有其他需求歡迎詢問"}
+            return answer + "\n\n若有其他需求歡迎詢問"
 
     # 此節點暫不使用
 
 
-    def build(self):
-        """建立 LangGraph 工作流程"""
+    def build(self, checkpointer=None):
+        """
+        建立 LangGraph 工作流程；未指定 checkpointer 時使用有上限的記憶體 checkpointer
+        """
         workflow = StateGraph(GraphState)
         
+        def add_node(name, node):
+            # 每個節點包裝計時 (Prometheus histogram、debug 時的每請求耗時與追蹤 span)
+            instrumented = settings.METRICS_ENABLED or settings.TRACE_ENABLED
+            workflow.add_node(name, instrument_node(name, node) if instrumented else node)
+        
         # 添加所有節點
-        workflow.add_node("initialize", self.initialize_conversation)  # 新增
-        workflow.add_node("guardrail", self.guardrail_node)      # 新增
-        workflow.add_node("rewrite", self.rewrite_node)
-        workflow.add_node("classify_query", self.classify_query)
-        workflow.add_node("retrieve", self.retrieve_node)
-        workflow.add_node("rerank", self.rerank_node) 
-        workflow.add_node("clarify", self.clarify_node)
-        workflow.add_node("generate", self.generate_node)
-        workflow.add_node("tools", ToolNode(self.rag_engine.tools))
-        workflow.add_node("increment_count", self.increment_tool_count)  # 新增
-        workflow.add_node("optimize_response", self.optimize_response_node) # 新增優化節點
+        add_node("initialize", self.initialize_conversation)  # 新增
+        add_node("guardrail", self.guardrail_node)      # 新增
+        add_node("rewrite", self.rewrite_node)
+        add_node("classify_query", self.classify_query)
+        add_node("retrieve", self.retrieve_node)
+        add_node("rerank", self.rerank_node) 
+        add_node("clarify", self.clarify_node)
+        add_node("no_context", self.no_context_node)
+        add_node("generate", self.generate_node)
+        add_node("tools", ToolNode(self.rag_engine.tools))
+        add_node("increment_count", self.increment_tool_count)  # 新增
+        add_node("optimize_response", self.optimize_response_node) # 新增優化節點
 
         # 定義流程邊
         workflow.set_entry_point("initialize")  # 從初始化開始
-        workflow.add_edge("initialize", "guardrail") # 改為接守衛
+        
+        if settings.FUSED_FRONTEND_ENABLED:
+            # 合併模式：一次呼叫完成守衛/改寫/分類，解析失敗時退回原本三個節點
+            add_node("fused_frontend", self.fused_frontend_node)
+            workflow.add_edge("initialize", "fused_frontend")
+            workflow.add_conditional_edges(
+                "fused_frontend",
+                self.check_fused_frontend,
+                {
+                    "continue": "retrieve",
+                    "fallback": "guardrail",
+                    "end": END
+                }
+            )
+        elif settings.SPECULATIVE_FRONTEND_ENABLED:
+            # 推測模式：守衛與改寫/分類/檢索並行，守衛攔截時捨棄推測結果 (retrieve 沿用推測檢索)
+            add_node("speculative_frontend", self.speculative_frontend_node)
+            workflow.add_edge("initialize", "speculative_frontend")
+            workflow.add_conditional_edges(
+                "speculative_frontend",
+                self.check_guardrail,
+                {
+                    "continue": "retrieve",
+                    "end": END
+                }
+            )
+        else:
+            workflow.add_edge("initialize", "guardrail") # 改為接守衛
         
         # 守衛條件邊
         workflow.add_conditional_edges(
@@ -458,7 +825,18 @@ class GraphBuilder:
         workflow.add_edge("rewrite", "classify_query")
         workflow.add_edge("classify_query", "retrieve")
         workflow.add_edge("retrieve", "rerank")
-        workflow.add_edge("rerank", "clarify")
+        
+        # 條件邊：Rerank 分數高 -> 直接生成；分數皆極低 -> 無相關資料；其餘 -> LLM 驗證
+        workflow.add_conditional_edges(
+            "rerank",
+            self.gate_by_rerank_score,
+            {
+                "generate": "generate",
+                "clarify": "clarify",
+                "no_context": "no_context"
+            }
+        )
+        workflow.add_edge("no_context", "generate")
         
         # 條件邊：Clarify -> Rewrite or Generate
         workflow.add_conditional_edges(
@@ -487,5 +865,6 @@ class GraphBuilder:
         workflow.add_edge("tools", "increment_count")
         workflow.add_edge("increment_count", "generate")
 
-        checkpointer = MemorySaver()
+        if checkpointer is None:
+            checkpointer = create_memory_checkpointer()
         return workflow.compile(checkpointer=checkpointer)
\ No newline at end of file
@@ -0,0 +1,93 @@
+import re
+import logging
+from typing import List, Optional
+from .normalization import normalize_question
+from .prompts import CLASSIFICATION_PROMPT
+
+logger = logging.getLogger(__name__)
+
+# 分類詞彙以外，守衛提示詞中的業務關鍵字
+_EXTRA_TOPIC_TERMS = ["請假", "休假", "差勤", "出差", "薪資", "薪水", "津貼", "勞保", "勞健保", "年資"]
+# 過於籠統、單獨出現時不足以判斷為業務相關的詞
+_GENERIC_TERMS = {"其他", "生產", "登記", "減免", "彈性", "外出"}
+
+# 簡單問候、感謝與結束語 (正規化後完全比對)
+_GREETING_PATTERN = re.compile(
+    r"(hi|hello|hey|嗨|哈囉|你好|您好|大家好|早安|午安|晚安|測試|test|在嗎|謝謝|謝謝你|感謝|thanks|thankyou|再見|掰掰|bye)+"
+)
+
+# 指令、程式碼、角色扮演或提示詞注入的跡象 (正規化後比對)；出現時即使含業務關鍵字也交給 LLM 守衛
+_INSTRUCTION_PATTERN = re.compile(
+    r"程式|代碼|編程|腳本|函式|函數|code|script|python|java|sql|html|"
+    r"忽略|無視|不理會|ignore|扮演|假裝|pretend|roleplay|你現在是|你是一個|從現在開始|"
+    r"prompt|提示詞|系統提示|指令|jailbreak|越獄|寫一|翻譯|translate"
+)
+
+
+def extract_topic_terms(prompt: str = CLASSIFICATION_PROMPT) -> List[str]:
+    """從分類提示詞的「- code (詞彙、詞彙)」列中取出業務詞彙"""
+    terms = []
+    for match in re.finditer(r"^- \w+ \((.+)\)\s*$", prompt, re.MULTILINE):
+        for term in match.group(1).split("、"):
+            term = term.strip()
+            if term and term not in _GENERIC_TERMS:
+                terms.append(term)
+    return terms
+
+
+class GuardrailPrefilter:
+    """
+    LLM 守衛前的本地分層篩選：
+    1. 問候/感謝語 -> 直接放行
+    2. 業務關鍵字 (由 CLASSIFICATION_PROMPT 詞彙編譯) -> 直接放行，僅限短問題
+    3. 與知識庫最高相似度：高於放行門檻 -> 放行；低於攔截門檻且無對話歷史 -> 攔截
+    含指令或程式碼跡象 (requires_llm) 的問題略過第 2、3 層；其餘不確定的情況才交給 guardrail_chain。
+    """
+
+    TIERS = ("greeting_pass", "keyword_pass", "embedding_pass", "embedding_block", "llm")
+
+    def __init__(self, pass_similarity: float, block_similarity: float, keyword_pass_max_chars: int = 30):
+        self.pass_similarity = pass_similarity
+        self.block_similarity = block_similarity
+        self.keyword_pass_max_chars = keyword_pass_max_chars
+        terms = set(extract_topic_terms() + _EXTRA_TOPIC_TERMS)
+        normalized_terms = sorted({normalize_question(t) for t in terms} - {""}, key=len, reverse=True)
+        self._topic_pattern = re.compile("|".join(re.escape(t) for t in normalized_terms))
+        self.counters = {tier: 0 for tier in self.TIERS}
+        logger.info(f"Guardrail prefilter compiled with {len(terms)} topic terms")
+
+    def requires_llm(self, query: str) -> bool:
+        """含指令、程式碼或角色扮演等跡象 (例如「忽略以上規則…特休」)，須由 LLM 守衛判斷"""
+        return bool(_INSTRUCTION_PATTERN.search(normalize_question(query)))
+
+    def match_rules(self, query: str) -> Optional[str]:
+        """第 1、2 層：規則比對，命中時回傳層級名稱"""
+        normalized = normalize_question(query)
+        if _GREETING_PATTERN.fullmatch(normalized):
+            return "greeting_pass"
+        # 關鍵字只能說明提到業務，長問題或含指令跡象時不足以放行
+        if len(normalized) > self.keyword_pass_max_chars or self.requires_llm(query):
+            return None
+        # 以正規化後的問題比對，簡體與全形輸入也能命中 (詞彙本身須同樣正規化)
+        if self._topic_pattern.search(normalized):
+            return "keyword_pass"
+        return None
+
+    def judge_similarity(self, similarity: float, has_history: bool) -> Optional[str]:
+        """第 3 層：依知識庫相似度判斷，不確定時回傳 None"""
+        if similarity >= self.pass_similarity:
+            return "embedding_pass"
+        # 追問 (例如「那怎麼算？」) 與知識庫相似度低，有歷史時不直接攔截
+        if similarity <= self.block_similarity and not has_history:
+            return "embedding_block"
+        return None
+
+    def record(self, tier: str):
+        self.counters[tier] += 1
+
+    def stats(self) -> dict:
+        total = sum(self.counters.values())
+        return {
+            **self.counters,
+            "llm_rate": self.counters["llm"] / total if total else 0.0,
+        }
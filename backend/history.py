@@ -0,0 +1,187 @@
+import re
+import threading
+from typing import Dict, List, Optional, Sequence
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from .metrics import LLM_CALLS, LLM_PROMPT_TOKENS, LLM_COMPLETION_TOKENS
+
+_CJK_CHAR = re.compile(r"[　-〿㐀-䶿一-鿿豈-﫿＀-￯]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    概略 token 數 (不載入 LLM 的 tokenizer)：
+    中文字與全形標點約 1 token / 字，其他文字約 4 字元 / token。
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_CHAR.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def message_tokens(message: BaseMessage) -> int:
+    tokens = estimate_tokens(str(message.content))
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        tokens += estimate_tokens(str(tool_call.get("args", "")))
+    return tokens
+
+
+def render_message(message: BaseMessage) -> str:
+    """單一訊息在對話歷史字串中的呈現 (SystemMessage 不呈現，回傳空字串)"""
+    if isinstance(message, HumanMessage):
+        return f"Human: {message.content}"
+    if isinstance(message, SystemMessage):
+        return ""
+    if isinstance(message, ToolMessage):
+        # 將工具結果摘要加入歷史，有助於上下文理解
+        content = str(message.content)
+        if len(content) > 100:
+            content = content[:100] + "..."
+        return f"System (Tool Result): {content}"
+    # AI Message
+    parts = []
+    if getattr(message, "tool_calls", None):
+        # 如果 AI 調用了工具，記錄一下調用的動作
+        tool_names = [tc.get("name") for tc in message.tool_calls]
+        parts.append(f"AI (Action): 調用了工具 {', '.join(tool_names)}")
+    if message.content:
+        parts.append(f"AI: {message.content}")
+    return "\n".join(parts)
+
+
+def fold_boundary(messages: Sequence[BaseMessage], start: int, keep_turns: int) -> int:
+    """
+    回傳可摺疊進摘要的訊息結尾位置：最近 keep_turns 輪 (自 HumanMessage 起) 保留原文。
+    沒有可摺疊的訊息時回傳 start。由最新訊息往前找，不需掃描整個 thread。
+    """
+    boundary = len(messages)
+    seen = 0
+    for i in range(len(messages) - 1, start - 1, -1):
+        if not isinstance(messages[i], HumanMessage):
+            continue
+        seen += 1
+        if seen == keep_turns:
+            boundary = i
+        elif seen > keep_turns:
+            return boundary
+    return start
+
+
+def fit_history(summary: str, lines: Sequence[str], budget: int, start: int = 0, end: Optional[int] = None) -> str:
+    """
+    組合「摘要 + 近期對話原文 (lines[start:end]，每則訊息一項)」並限制在 token 預算內：
+    由最新一則往前取，超出預算即停止 (成本只與預算內的訊息數有關)；
+    摘要本身超出預算時只保留結尾。
+    """
+    end = len(lines) if end is None else min(end, len(lines))
+    header = f"先前對話摘要: {summary}" if summary else ""
+    used = estimate_tokens(header)
+    kept: List[str] = []
+    for i in range(end - 1, start - 1, -1):
+        line = lines[i]
+        if not line:
+            continue
+        cost = estimate_tokens(line) + 1
+        if budget > 0 and used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    if budget > 0 and header and estimate_tokens(header) > budget:
+        header = header[-budget:]
+    return "\n".join(([header] if header else []) + kept[::-1]).strip()
+
+
+def select_recent_messages(messages: Sequence[BaseMessage], budget: int, start: int = 0) -> List[BaseMessage]:
+    """
+    由最新一輪往前挑選 messages[start:] 中的整輪訊息直到用完 token 預算；
+    最新一輪 (目前問題與進行中的工具呼叫) 一定保留。
+    """
+    selected: List[BaseMessage] = []
+    turn: List[BaseMessage] = []
+    used = 0
+    for i in range(len(messages) - 1, start - 1, -1):
+        message = messages[i]
+        if isinstance(message, SystemMessage):
+            continue
+        turn.append(message)
+        if isinstance(message, HumanMessage) or i == start:
+            cost = sum(message_tokens(m) for m in turn)
+            if selected and budget > 0 and used + cost > budget:
+                break
+            selected.extend(turn)
+            used += cost
+            turn = []
+    return selected[::-1]
+
+
+class TokenUsageStats:
+    """各節點每次 LLM 呼叫的 prompt / completion token 數 (Ollama 有回傳時為實際值，否則為估計值) 統計"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._nodes: Dict[str, dict] = {}
+
+    def record(self, node: str, prompt_tokens: int, history_tokens: int = 0, output_tokens: Optional[int] = None):
+        LLM_CALLS.inc(node=node)
+        LLM_PROMPT_TOKENS.inc(prompt_tokens, node=node)
+        if output_tokens:
+            LLM_COMPLETION_TOKENS.inc(output_tokens, node=node)
+        with self._lock:
+            stats = self._nodes.setdefault(node, {
+                "calls": 0, "prompt_tokens_total": 0, "prompt_tokens_max": 0,
+                "history_tokens_total": 0, "output_tokens_total": 0,
+            })
+            stats["calls"] += 1
+            stats["prompt_tokens_total"] += prompt_tokens
+            stats["prompt_tokens_max"] = max(stats["prompt_tokens_max"], prompt_tokens)
+            stats["history_tokens_total"] += history_tokens
+            if output_tokens:
+                stats["output_tokens_total"] += output_tokens
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                node: {**stats, "prompt_tokens_avg": stats["prompt_tokens_total"] / stats["calls"]}
+                for node, stats in self._nodes.items()
+            }
+
+
+class TokenUsageCallbackHandler(BaseCallbackHandler):
+    """
+    附加在單次 LLM 呼叫 (chain.with_config(callbacks=...)) 上，於呼叫結束時記錄 token 數：
+    使用 Ollama 回傳的 usage_metadata / prompt_eval_count、eval_count，沒有時才以實際送出的 prompt 與輸出估計。
+    """
+
+    # 在 event loop 中直接執行，不另外排入執行緒池
+    run_inline = True
+
+    def __init__(self, stats: TokenUsageStats, node: str, history_tokens: int = 0):
+        self.stats = stats
+        self.node = node
+        self.history_tokens = history_tokens
+        self._estimated_prompts: Dict[UUID, int] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        self._estimated_prompts[run_id] = sum(message_tokens(m) for batch in messages for m in batch)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs):
+        self._estimated_prompts[run_id] = sum(estimate_tokens(p) for p in prompts)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        estimated_prompt = self._estimated_prompts.pop(run_id, 0)
+        generations = response.generations[0] if response.generations else []
+        generation = generations[0] if generations else None
+        usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+        # OllamaLLM (非 chat 模型) 的實際 token 數在 generation_info
+        info = getattr(generation, "generation_info", None) or {}
+        self.stats.record(
+            self.node,
+            usage.get("input_tokens") or info.get("prompt_eval_count") or estimated_prompt,
+            history_tokens=self.history_tokens,
+            output_tokens=usage.get("output_tokens") or info.get("eval_count")
+            or estimate_tokens(generation.text if generation is not None else "")
+        )
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        self._estimated_prompts.pop(run_id, None)
@@ -0,0 +1,228 @@
+import os
+import json
+import pickle
+import shutil
+import hashlib
+import logging
+import time
+from typing import List, Optional
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+from .config import settings
+from .ingestion import EmbeddingCache, build_vectorstore, apply_incremental_update
+from .inference_backend import embedding_model_id
+from .ann_index import ann_settings, configure_search
+from .lexical_index import BM25Index
+
+logger = logging.getLogger(__name__)
+
+# 文件轉換格式 (page_content / metadata) 變更時請遞增，使舊索引失效
+INDEX_SCHEMA_VERSION = 2
+MANIFEST_FILE = "manifest.json"
+
+
+def _hash_file(path: str) -> str:
+    """計算檔案內容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def index_settings() -> dict:
+    """影響索引內容的設定值"""
+    return {
+        "schema_version": INDEX_SCHEMA_VERSION,
+        "embedding_model": embedding_model_id(),
+        **ann_settings(),
+    }
+
+
+def compute_index_key(data_path: str) -> str:
+    """以 CSV 內容、Embedding 模型與索引設定計算索引鍵值"""
+    payload = {
+        "data_sha256": _hash_file(data_path),
+        **index_settings(),
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def _index_path(key: str) -> str:
+    return os.path.join(settings.get_absolute_index_dir(), key)
+
+
+def load_index(key: str, embeddings, mmap: Optional[bool] = None) -> Optional[FAISS]:
+    """載入已持久化的索引，不存在或損毀時回傳 None"""
+    path = _index_path(key)
+    if not os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        return None
+    if mmap is None:
+        mmap = settings.INDEX_MMAP
+
+    try:
+        import faiss
+
+        # 與 FAISS.load_local 相同的檔案格式，但索引檔只讀取一次：
+        # memory-map 時向量不會先完整載入記憶體，多個 worker 共用同一份分頁快取
+        # (memory-map 只支援 Flat 索引的向量儲存)
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if mmap and settings.INDEX_TYPE == "flat" else 0
+        index = faiss.read_index(os.path.join(path, "index.faiss"), flags)
+        with open(os.path.join(path, "index.pkl"), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        vectorstore = FAISS(
+            embedding_function=embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id
+        )
+        configure_search(vectorstore.index)
+        logger.info(f"Loaded persisted index {key} from {path}")
+        return vectorstore
+    except Exception as e:
+        logger.warning(f"Failed to load persisted index {key}, rebuilding: {e}")
+        return None
+
+
+def save_index(key: str, vectorstore: FAISS, document_count: int, lexical_index: Optional[BM25Index] = None):
+    """原子性地將索引 (向量與 BM25) 寫入磁碟 (先寫暫存目錄再改名)"""
+    path = _index_path(key)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    os.makedirs(settings.get_absolute_index_dir(), exist_ok=True)
+
+    vectorstore.save_local(tmp_path)
+    if lexical_index is not None:
+        lexical_index.save(tmp_path)
+    manifest = {
+        "key": key,
+        "document_count": document_count,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        **index_settings(),
+    }
+    with open(os.path.join(tmp_path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+    logger.info(f"Persisted index {key} to {path}")
+
+
+def prune_stale_indexes(keep_key: str):
+    """移除其他版本的索引目錄"""
+    index_dir = settings.get_absolute_index_dir()
+    if not os.path.isdir(index_dir):
+        return
+    for name in os.listdir(index_dir):
+        if name == keep_key or name.startswith(f"{keep_key}.tmp-"):
+            continue
+        if not os.path.exists(os.path.join(index_dir, name, MANIFEST_FILE)):
+            continue
+        path = os.path.join(index_dir, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+            logger.info(f"Removed stale index {name}")
+
+
+def find_latest_index() -> Optional[str]:
+    """找出設定相容 (相同模型與 schema) 的最新索引鍵值"""
+    index_dir = settings.get_absolute_index_dir()
+    if not os.path.isdir(index_dir):
+        return None
+
+    expected = index_settings()
+    candidates = []
+    for name in os.listdir(index_dir):
+        manifest_path = os.path.join(index_dir, name, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            continue
+        try:
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        if all(manifest.get(k) == v for k, v in expected.items()):
+            candidates.append((os.path.getmtime(manifest_path), name))
+
+    return max(candidates)[1] if candidates else None
+
+
+def ingest_documents(documents: List[Document], embeddings, key: str,
+                     incremental: bool = True, persist: Optional[bool] = None) -> FAISS:
+    """
+    以增量方式建立索引：
+    有相容的舊索引時只處理差異列，否則以 embedding 快取建立完整索引
+    """
+    if persist is None:
+        persist = settings.INDEX_PERSIST
+    cache = EmbeddingCache(settings.get_absolute_embedding_cache_path(), embedding_model_id())
+    start = time.perf_counter()
+
+    previous_key = find_latest_index() if incremental else None
+    vectorstore = load_index(previous_key, embeddings, mmap=False) if previous_key else None
+    if vectorstore is not None:
+        logger.info(f"Updating index {previous_key} incrementally...")
+        try:
+            apply_incremental_update(vectorstore, documents, embeddings, cache)
+        except ValueError as e:
+            logger.info(f"Incremental update not possible ({e}), rebuilding from {len(documents)} documents...")
+            vectorstore = build_vectorstore(documents, embeddings, cache)
+    else:
+        logger.info(f"No compatible index found, building from {len(documents)} documents...")
+        vectorstore = build_vectorstore(documents, embeddings, cache)
+
+    logger.info(
+        f"Ingestion finished in {time.perf_counter() - start:.1f}s "
+        f"(embedding cache hits: {cache.hits}, misses: {cache.misses})"
+    )
+
+    if persist:
+        try:
+            cache.retain([doc.page_content for doc in documents])
+            cache.save()
+            lexical_index = BM25Index(documents) if settings.HYBRID_SEARCH_ENABLED else None
+            save_index(key, vectorstore, len(documents), lexical_index)
+            prune_stale_indexes(key)
+        except OSError as e:
+            logger.warning(f"Failed to persist index (continuing in memory): {e}")
+    return vectorstore
+
+
+def load_or_build_vectorstore(documents: List[Document], embeddings, data_path: str,
+                              key: Optional[str] = None) -> FAISS:
+    """
+    載入磁碟上的索引；當鍵值 (CSV、模型、設定) 改變時才增量更新
+    """
+    if key is None:
+        key = compute_index_key(data_path)
+    vectorstore = load_index(key, embeddings)
+    if vectorstore is not None:
+        return vectorstore
+
+    logger.info(f"No persisted index for key {key}")
+    vectorstore = ingest_documents(documents, embeddings, key)
+    if settings.INDEX_MMAP and settings.INDEX_PERSIST:
+        # 重新以 memory-map 方式載入剛寫入的索引
+        vectorstore = load_index(key, embeddings) or vectorstore
+    return vectorstore
+
+
+def load_or_build_lexical_index(documents: List[Document], key: str) -> BM25Index:
+    """
+    載入與向量索引一同持久化的 BM25 索引；不存在 (例如 INDEX_PERSIST=false) 時
+    直接由文件建立，並在索引目錄存在時補寫入。
+    """
+    path = _index_path(key)
+    lexical_index = BM25Index.load(path)
+    if lexical_index is not None and len(lexical_index) == len(documents):
+        logger.info(f"Loaded persisted lexical index {key}")
+        return lexical_index
+
+    lexical_index = BM25Index(documents)
+    if settings.INDEX_PERSIST and os.path.isdir(path):
+        try:
+            lexical_index.save(path)
+        except OSError as e:
+            logger.warning(f"Failed to persist lexical index: {e}")
+    return lexical_index
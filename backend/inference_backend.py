@@ -0,0 +1,110 @@
+import os
+import re
+import logging
+from typing import TYPE_CHECKING, Optional
+from .config import settings
+
+if TYPE_CHECKING:
+    # 模型相關套件 (torch / transformers) 匯入成本高，延遲到實際載入模型時才匯入
+    from langchain_huggingface import HuggingFaceEmbeddings
+    from langchain_community.cross_encoders import HuggingFaceCrossEncoder
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "onnx_int8")
+
+
+def embedding_model_id(backend: Optional[str] = None) -> str:
+    """
+    Embedding 模型識別字串 (含推論後端)；
+    量化後向量會有些微差異，索引與快取需依此區分。
+    """
+    backend = backend or settings.INFERENCE_BACKEND
+    if backend == "torch":
+        return settings.EMBEDDING_MODEL
+    return f"{settings.EMBEDDING_MODEL}@{backend}"
+
+
+def configure_threads(threads: Optional[int] = None):
+    """設定 PyTorch 的 CPU 執行緒數 (0 表示使用預設值)"""
+    threads = settings.INFERENCE_THREADS if threads is None else threads
+    if threads > 0:
+        import torch
+        torch.set_num_threads(threads)
+        logger.info(f"PyTorch intra-op threads set to {threads}")
+
+
+def _ort_session_options(threads: int):
+    try:
+        import onnxruntime as ort
+    except ImportError as e:
+        raise ImportError(
+            "INFERENCE_BACKEND=onnx/onnx_int8 requires the ONNX extras: pip install \"sentence-transformers[onnx]>=4.1\""
+        ) from e
+    options = ort.SessionOptions()
+    if threads > 0:
+        options.intra_op_num_threads = threads
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return options
+
+
+def _quantized_model_dir(model_name: str) -> str:
+    safe_name = re.sub(r"[^\w.-]+", "__", model_name)
+    return os.path.join(settings.get_absolute_onnx_model_dir(), safe_name)
+
+
+def _prepare_int8_model(model_name: str, model_cls) -> tuple:
+    """
+    匯出 ONNX 並做 dynamic int8 量化 (只在第一次執行)，
+    回傳 (本地模型目錄, 量化檔案名稱)
+    """
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    config = settings.ONNX_QUANTIZATION_CONFIG
+    local_dir = _quantized_model_dir(model_name)
+    file_name = f"model_qint8_{config}.onnx"
+    if not os.path.exists(os.path.join(local_dir, "onnx", file_name)):
+        logger.info(f"Exporting {model_name} to ONNX with dynamic int8 quantization ({config})...")
+        model = model_cls(model_name, backend="onnx")
+        model.save_pretrained(local_dir)
+        export_dynamic_quantized_onnx_model(model, quantization_config=config, model_name_or_path=local_dir)
+    return local_dir, f"onnx/{file_name}"
+
+
+def _backend_kwargs(model_name: str, model_cls, backend: str, threads: int) -> tuple:
+    """回傳 (模型名稱或路徑, 傳給 sentence-transformers 的參數)"""
+    if backend == "torch":
+        return model_name, {}
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown INFERENCE_BACKEND: {backend} (expected one of {BACKENDS})")
+
+    ort_kwargs = {"session_options": _ort_session_options(threads)}
+    if backend == "onnx":
+        return model_name, {"backend": "onnx", "model_kwargs": ort_kwargs}
+
+    local_dir, file_name = _prepare_int8_model(model_name, model_cls)
+    return local_dir, {"backend": "onnx", "model_kwargs": {"file_name": file_name, **ort_kwargs}}
+
+
+def load_embeddings(backend: Optional[str] = None, threads: Optional[int] = None) -> "HuggingFaceEmbeddings":
+    """依 INFERENCE_BACKEND 載入 Embedding 模型"""
+    from sentence_transformers import SentenceTransformer
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    backend = backend or settings.INFERENCE_BACKEND
+    threads = settings.INFERENCE_THREADS if threads is None else threads
+    model_path, model_kwargs = _backend_kwargs(settings.EMBEDDING_MODEL, SentenceTransformer, backend, threads)
+    logger.info(f"Loading embedding model {settings.EMBEDDING_MODEL} (backend: {backend})")
+    return HuggingFaceEmbeddings(model_name=model_path, model_kwargs=model_kwargs)
+
+
+def load_cross_encoder(backend: Optional[str] = None, threads: Optional[int] = None) -> "HuggingFaceCrossEncoder":
+    """依 INFERENCE_BACKEND 載入 Cross-Encoder (Reranker)"""
+    from sentence_transformers import CrossEncoder
+    from langchain_community.cross_encoders import HuggingFaceCrossEncoder
+
+    backend = backend or settings.INFERENCE_BACKEND
+    threads = settings.INFERENCE_THREADS if threads is None else threads
+    model_path, model_kwargs = _backend_kwargs(settings.RERANKER_MODEL, CrossEncoder, backend, threads)
+    logger.info(f"Loading reranker model {settings.RERANKER_MODEL} (backend: {backend})")
+    return HuggingFaceCrossEncoder(model_name=model_path, model_kwargs=model_kwargs)
@@ -0,0 +1,99 @@
+import asyncio
+import os
+import time
+import logging
+from typing import Optional
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class KnowledgeBaseReloader:
+    """
+    管理知識庫熱更新：管理端點觸發或檔案監看觸發，
+    於背景重建後替換 RAGComponents 中的知識庫快照。
+    """
+
+    def __init__(self, rag_system):
+        self.rag_system = rag_system
+        self._task: Optional[asyncio.Task] = None
+        self._watch_task: Optional[asyncio.Task] = None
+        self.last_reload_at: Optional[float] = None
+        self.last_error: str = ""
+
+    @property
+    def reloading(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def trigger(self, force: bool = False) -> bool:
+        """啟動背景重建；已在進行中時回傳 False"""
+        if self.reloading:
+            return False
+        self._task = asyncio.create_task(self._reload(force))
+        return True
+
+    async def _reload(self, force: bool):
+        start = time.perf_counter()
+        try:
+            swapped = await self.rag_system.areload_knowledge_base(force=force)
+            self.last_error = ""
+            if swapped:
+                self.last_reload_at = time.time()
+                logger.info(f"Knowledge base reload finished in {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"Knowledge base reload failed, keeping current version: {e}")
+
+    def status(self) -> dict:
+        return {
+            "version": self.rag_system.kb_version,
+            "document_count": len(self.rag_system.documents),
+            "reloading": self.reloading,
+            "last_reload_at": self.last_reload_at,
+            "last_error": self.last_error,
+        }
+
+    def start_watching(self):
+        """啟動資料檔案監看 (輪詢 mtime/size)"""
+        if self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        data_path = settings.get_absolute_data_path()
+        logger.info(f"Watching knowledge base file: {data_path} (every {settings.KB_WATCH_INTERVAL}s)")
+        last_signature = self._file_signature(data_path)
+        pending_signature = None
+        while True:
+            await asyncio.sleep(settings.KB_WATCH_INTERVAL)
+            signature = self._file_signature(data_path)
+            if signature is None or signature == last_signature:
+                pending_signature = None
+                continue
+            # 等檔案連續兩次輪詢皆未變動 (寫入完成) 才觸發
+            if signature != pending_signature:
+                pending_signature = signature
+                continue
+            if not self.trigger():
+                # 重建進行中，下次輪詢再試
+                continue
+            logger.info("Knowledge base file changed, reload triggered")
+            last_signature = signature
+            pending_signature = None
+
+    @staticmethod
+    def _file_signature(path: str):
+        try:
+            stat = os.stat(path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    async def stop(self):
+        """停止監看與進行中的重建"""
+        for task in (self._watch_task, self._task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
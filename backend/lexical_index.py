@@ -0,0 +1,121 @@
+import os
+import re
+import math
+import pickle
+import logging
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+from .normalization import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# 斷詞方式或儲存格式變更時請遞增，使舊的持久化檔案失效
+LEXICAL_INDEX_VERSION = 1
+LEXICAL_INDEX_FILE = "lexical_index.pkl"
+
+_CJK_RUN = re.compile(r"[㐀-䶿一-鿿豈-﫿]+")
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    中文以字元 bigram 切分 (「陪產檢」->「陪產」「產檢」，單字詞保留單字)，
+    英數字以連續字元為一詞。不需額外的斷詞字典。
+    """
+    text = normalize_text(text)
+    tokens = []
+    for run in _CJK_RUN.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    tokens.extend(_WORD.findall(text))
+    return tokens
+
+
+def document_text(doc: Document) -> str:
+    """建立索引的文字：問題與答案"""
+    return f"{doc.page_content} {doc.metadata.get('answer', '')}"
+
+
+class BM25Index:
+    """
+    知識庫問題與答案的記憶體內倒排索引 (Okapi BM25)，
+    補足向量檢索對逐字出現的專有名詞 (如「陪產檢」、「教召」) 的不足。
+    """
+
+    def __init__(self, documents: List[Document], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids: List[str] = []
+        self.categories: List[str] = []
+        self.doc_lengths: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+
+        for position, doc in enumerate(documents):
+            counts = Counter(tokenize(document_text(doc)))
+            self.doc_ids.append(doc.id)
+            self.categories.append(doc.metadata.get("category") or "")
+            self.doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((position, tf))
+
+        total = len(self.doc_lengths)
+        self.avg_length = sum(self.doc_lengths) / total if total else 0.0
+        self.idf = {
+            term: math.log(1 + (total - len(plist) + 0.5) / (len(plist) + 0.5))
+            for term, plist in self.postings.items()
+        }
+        logger.info(f"BM25 index built: {total} documents, {len(self.postings)} terms")
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def search(self, query: str, k: int, category: Optional[str] = None) -> List[Tuple[str, float]]:
+        """回傳分數最高的 k 筆 (文件 id, BM25 分數)；可限定分類"""
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = self.idf[term]
+            for position, tf in plist:
+                if category and self.categories[position] != category:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[position] / self.avg_length)
+                scores[position] = scores.get(position, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        top = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:k]
+        return [(self.doc_ids[position], score) for position, score in top]
+
+    def save(self, directory: str):
+        """原子性寫入索引目錄 (與向量索引放在一起)"""
+        path = os.path.join(directory, LEXICAL_INDEX_FILE)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"version": LEXICAL_INDEX_VERSION, "index": self}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(directory: str) -> Optional["BM25Index"]:
+        path = os.path.join(directory, LEXICAL_INDEX_FILE)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                data = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Failed to load lexical index from {path}: {e}")
+            return None
+        if data.get("version") != LEXICAL_INDEX_VERSION:
+            return None
+        return data["index"]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[str]:
+    """Reciprocal Rank Fusion：score(d) = Σ 1 / (k + rank)，回傳融合後的 id 排序"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
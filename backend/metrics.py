@@ -0,0 +1,193 @@
+import time
+import bisect
+import inspect
+import threading
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from langchain_core.runnables import RunnableConfig
+from .tracing import span
+
+# 延遲分佈的 bucket 上限 (秒)，涵蓋本地 FAISS 檢索到整輪 LLM 生成
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+# (metric 名稱, 類型, 說明, [(labels, 數值)])
+MetricFamily = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """只增不減的計數器 (Prometheus counter)"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        # 無 label 的計數器從 0 開始輸出
+        self._values: Dict[tuple, float] = {} if self.labelnames else {(): 0}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in self._values.items():
+                labels = _format_labels(dict(zip(self.labelnames, key)))
+                lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """延遲分佈 (Prometheus histogram，累積 bucket)"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # labels -> [各 bucket 次數 (非累積，最後一格為 +Inf), 總和]
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in self._values.items():
+                base = dict(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    labels = _format_labels({**base, "le": _format_value(bound)})
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(base)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Prometheus 文字格式 (0.0.4) 的 metrics 註冊表。
+    collector 於每次 scrape 時呼叫，將既有的統計 (例如快取命中數) 轉為 metric family。
+    """
+
+    def __init__(self):
+        self._metrics: list = []
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[MetricFamily]]):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+NODE_DURATION = REGISTRY.histogram("rag_node_duration_seconds", "LangGraph node latency.", ["node"])
+NODE_ERRORS = REGISTRY.counter("rag_node_errors_total", "LangGraph node exceptions.", ["node"])
+REQUEST_DURATION = REGISTRY.histogram(
+    "rag_request_duration_seconds", "End-to-end query latency by answer path.", ["path"]
+)
+REQUESTS = REGISTRY.counter("rag_requests_total", "Queries by answer path.", ["path"])
+LLM_CALLS = REGISTRY.counter("rag_llm_calls_total", "LLM calls by node.", ["node"])
+LLM_PROMPT_TOKENS = REGISTRY.counter("rag_llm_prompt_tokens_total", "LLM prompt tokens by node.", ["node"])
+LLM_COMPLETION_TOKENS = REGISTRY.counter(
+    "rag_llm_completion_tokens_total", "LLM completion tokens by node (estimated when Ollama does not report them).", ["node"]
+)
+REWRITE_RETRIES = REGISTRY.counter("rag_rewrite_retries_total", "Rewrites triggered by failed retrieval verification.")
+TOOL_CALLS = REGISTRY.counter("rag_tool_loops_total", "Tool-calling loop iterations.")
+
+# 目前請求的各節點耗時 (QueryRequest.debug 時回傳)；LangGraph 節點在複製的 context 中執行，共用同一個 list
+_request_timings: ContextVar[Optional[list]] = ContextVar("request_timings", default=None)
+
+
+def start_request_timings() -> list:
+    """開始收集目前請求的各節點耗時"""
+    timings: list = []
+    _request_timings.set(timings)
+    return timings
+
+
+def instrument_node(name: str, node) -> Callable:
+    """
+    包裝 graph 節點 (async 函數或 Runnable，例如 ToolNode)，記錄耗時、例外次數與追蹤 span。
+    包裝後的函數一律接受 config，LangGraph 會依參數名稱傳入。
+    """
+    if hasattr(node, "ainvoke") and not inspect.iscoroutinefunction(node):
+        # 以不同的 run name 執行，避免串流時與外層節點重複觸發 on_chain_start
+        runnable = node.with_config(run_name=f"{name}_runnable")
+
+        async def call(state, config):
+            return await runnable.ainvoke(state, config)
+    elif "config" in inspect.signature(node).parameters:
+        call = node
+    else:
+        async def call(state, config):
+            return await node(state)
+
+    async def timed(state, config: RunnableConfig):
+        start = time.perf_counter()
+        try:
+            with span("node", name):
+                return await call(state, config)
+        except Exception:
+            NODE_ERRORS.inc(node=name)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            NODE_DURATION.observe(elapsed, node=name)
+            timings = _request_timings.get()
+            if timings is not None:
+                timings.append({"node": name, "ms": round(elapsed * 1000, 2)})
+
+    timed.__name__ = name
+    return timed
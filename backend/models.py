@@ -1,13 +1,19 @@
-from typing import TypedDict, List, Annotated, Sequence
-from pydantic import BaseModel
+import operator
+from typing import TypedDict, List, Annotated, Sequence, Literal, Optional
+from pydantic import BaseModel, field_validator
 from langchain_core.documents import Document
 from langchain_core.messages import BaseMessage
 from langgraph.graph.message import add_messages
+from .prompts import CATEGORY_TERMS
+
+# 問題分類代碼 (由 CATEGORY_TERMS 產生，與提示詞一致)
+QUERY_CATEGORIES = tuple(CATEGORY_TERMS)
 
 # --- Pydantic Models for API ---
 class QueryRequest(BaseModel):
     question: str
     thread_id: str = "default_thread"  # 新增 thread_id 支援多輪對話
+    debug: bool = False  # 回傳各節點耗時 (timings)
 
 class QueryResponse(BaseModel):
     success: bool
@@ -16,6 +22,23 @@ class QueryResponse(BaseModel):
     answer: str = ""
     context: str = ""
     error: str = ""
+    timings: Optional[List[dict]] = None  # debug 時的各節點耗時 [{"node", "ms"}]，最後一項為 total
+
+# --- Pydantic Models for LLM Structured Output ---
+class FrontEndDecision(BaseModel):
+    """合併前置處理 (守衛 + 改寫 + 分類) 的 LLM 輸出格式"""
+    decision: Literal["allowed", "blocked"]
+    reason: str = ""
+    response: str = ""
+    rewritten_query: str = ""
+    category: str = "other"
+
+    @field_validator("category")
+    @classmethod
+    def validate_category(cls, value: str) -> str:
+        # 與 classify_query 相同：未知分類視為 other，不捨棄有效的守衛與改寫結果
+        value = value.strip()
+        return value if value in QUERY_CATEGORIES else "other"
 
 # --- TypedDict for LangGraph State ---
 class GraphState(TypedDict):
@@ -23,7 +46,9 @@ class GraphState(TypedDict):
     original_query: str
     rewritten_query: str
     retrieved_docs: List[Document]
+    speculative_docs: List[Document]  # 推測執行模式下與守衛並行、以改寫問題與分類預先檢索的文件
     reranked_docs: List[Document]
+    rerank_scores: List[float]  # Cross-Encoder 分數 (與 reranked_docs 對應)
     answer: str
     category: str # User question category (e.g., sick_leave)
     final_answer: str
@@ -31,5 +56,10 @@ class GraphState(TypedDict):
     context: str
     retry_count: int
     tool_call_count: int  # 追蹤工具調用次數，避免無限循環
+    fast_path: str  # 本輪走的快速路徑 (例如 "calculator")，空字串表示一般流程
+    history_summary: str  # 已摺疊的較舊對話摘要 (背景產生)
+    summarized_count: int  # messages 中已摺疊進摘要的訊息數 (前綴長度)
+    # 已呈現的對話歷史 (與 messages 一一對應的字串)，每輪只追加新訊息的呈現
+    history_lines: Annotated[List[str], operator.add]
     # 用 Annotated 標註 add_messages，讓訊息可以自動累加
     messages: Annotated[Sequence[BaseMessage], add_messages]
@@ -0,0 +1,37 @@
+import re
+import unicodedata
+import opencc
+
+# 簡轉繁，確保簡體與繁體輸入得到相同鍵值
+_cc = opencc.OpenCC('s2t')
+
+# 空白、標點與符號 (NFKC 後全形已轉為半形)
+_STRIP_PATTERN = re.compile(r"[\s\W_]+", re.UNICODE)
+
+
+def normalize_question(text: str) -> str:
+    """
+    問題正規化：全形/半形統一、轉繁體、去除空白與標點、英文轉小寫。
+    例如「事假有幾天？」、「事假有几天 ?」都會得到「事假有幾天」。
+    """
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text)
+    text = _cc.convert(text)
+    text = _STRIP_PATTERN.sub("", text)
+    return text.lower()
+
+
+def normalize_cache_key(text: str) -> str:
+    """
+    快取鍵值用的輕量正規化：只統一全形/半形並合併空白，
+    保留標點與簡繁差異 (與 normalize_question 不同)。
+    """
+    return " ".join(unicodedata.normalize("NFKC", text or "").split())
+
+
+def normalize_text(text: str) -> str:
+    """全形/半形統一、轉繁體、英文轉小寫，保留空白與標點 (斷詞前使用)"""
+    if not text:
+        return ""
+    return _cc.convert(unicodedata.normalize("NFKC", text)).lower()
@@ -0,0 +1,104 @@
+import re
+import threading
+from typing import Optional, Tuple
+from langdetect import detect, LangDetectException
+
+GREETING = "同仁您好"
+CLOSING = "若有其他需求歡迎詢問"
+
+_CJK_CHAR = re.compile(r"[㐀-䶿一-鿿豈-﫿]")
+_LATIN_WORD = re.compile(r"[A-Za-z]+")
+# 亂碼：Unicode 替代字元、控制字元
+_GARBLED = re.compile(r"[�\x00-\x08\x0b\x0c\x0e-\x1f]")
+# optimize_response 曾輸出的 JSON 包裝、模型的思考標記
+_WRAPPED = re.compile(r"^\s*(?:\{|```json)|</?think>")
+# 「*」僅在後接空白時視為清單符號，避免破壞「**粗體**」
+_BULLET = re.compile(r"^(\s*)(?:[•●▪・]\s*|\*(?!\*)\s+)", re.MULTILINE)
+# 以標題、清單、編號或表格開頭的回答，問候語需獨立成段
+_BLOCK_START = re.compile(r"#|-|\d+\.|\|")
+_HEADING = re.compile(r"^(#{1,6})(?=[^#\s])", re.MULTILINE)
+_TRAILING_SPACE = re.compile(r"[ \t]+$", re.MULTILINE)
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def check_answer(answer: str, min_cjk_ratio: float) -> Optional[str]:
+    """
+    檢查回答是否可只做本地後處理；回傳未通過的原因，通過時回傳 None。
+    - garbled：含亂碼
+    - format：JSON 包裝、思考標記或未閉合的程式碼區塊
+    - language：中文字比例偏低且 langdetect 判定非中文
+    """
+    if not answer or not answer.strip():
+        return "empty"
+    if _GARBLED.search(answer):
+        return "garbled"
+    if _WRAPPED.search(answer) or answer.count("```") % 2:
+        return "format"
+    cjk = len(_CJK_CHAR.findall(answer))
+    latin = sum(len(w) for w in _LATIN_WORD.findall(answer))
+    if cjk + latin == 0:
+        return "language"
+    if cjk / (cjk + latin) < min_cjk_ratio:
+        # 中英夾雜時再以 langdetect 確認
+        try:
+            if not detect(answer).startswith("zh"):
+                return "language"
+        except LangDetectException:
+            return "language"
+    return None
+
+
+def normalize_markdown(text: str) -> str:
+    """統一換行與清單符號、標題後補空白、去除行尾空白並合併多餘空行"""
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = _BULLET.sub(r"\1- ", text)
+    text = _HEADING.sub(r"\1 ", text)
+    text = _TRAILING_SPACE.sub("", text)
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+def local_optimize(answer: str, converter) -> str:
+    """本地後處理：轉繁體、整理 Markdown、補上問候語與標準結尾"""
+    text = normalize_markdown(converter.convert(answer))
+    if not text.startswith(("同仁", "您好")):
+        separator = "\n\n" if _BLOCK_START.match(text) else ""
+        text = f"{GREETING}，{separator}{text}"
+    if CLOSING not in text[-len(CLOSING) * 2:]:
+        text = f"{text}\n\n{CLOSING}"
+    return text
+
+
+class OptimizerStats:
+    """回答優化統計：本地後處理 (略過 LLM) 與退回 LLM 優化的次數及原因"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.local = 0
+        self.llm = 0
+        self.reasons = {}
+
+    def record(self, reason: Optional[str]):
+        with self._lock:
+            if reason is None:
+                self.local += 1
+            else:
+                self.llm += 1
+                self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.local + self.llm
+            return {
+                "local": self.local,
+                "llm": self.llm,
+                "skip_rate": self.local / total if total else 0.0,
+                "llm_reasons": dict(self.reasons),
+            }
+
+
+def postprocess_answer(answer: str, converter, min_cjk_ratio: float) -> Tuple[Optional[str], Optional[str]]:
+    """回傳 (本地後處理結果, None)；檢查未通過時回傳 (None, 原因)，由呼叫端改用 LLM 優化"""
+    reason = check_answer(answer, min_cjk_ratio)
+    if reason is not None:
+        return None, reason
+    return local_optimize(answer, converter), None
@@ -1,94 +1,294 @@
-import pandas as pd
-from typing import List, Optional
+import time
+import asyncio
+import threading
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
 from langchain_core.documents import Document
-from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
-from sentence_transformers import SentenceTransformer
-from langchain_ollama import OllamaLLM, ChatOllama
-from langchain_classic.retrievers import ContextualCompressionRetriever
-from langchain_classic.retrievers.document_compressors import CrossEncoderReranker
-from langchain_community.cross_encoders import HuggingFaceCrossEncoder
-from langchain_core.prompts import ChatPromptTemplate
 from .config import settings
+from .index_store import load_or_build_vectorstore, load_or_build_lexical_index, compute_index_key
+from .ingestion import load_documents
+from .normalization import normalize_question, normalize_cache_key
+from .lru_cache import LRUCache
+from .inference_backend import load_embeddings, load_cross_encoder, configure_threads, embedding_model_id
+from .category_classifier import EmbeddingCategoryClassifier
+from .category_index import CategorySubIndexes
+from .lexical_index import BM25Index, reciprocal_rank_fusion
 from .tools import calculate_vacation_pay, calculate_unused_overtime_pay
+from .tracing import span, annotate, doc_ids
 import logging
 
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import FAISS
+
 logger = logging.getLogger(__name__)
 
+# 啟動時平行載入的元件 (readiness 回報各自狀態)
+COMPONENTS = ("embeddings", "knowledge_base", "reranker", "llm")
+
+class KnowledgeBaseIndex:
+    """
+    知識庫快照：文件、向量資料庫與 retriever 作為一個整體替換，
+    進行中的請求會持續使用取得時的快照。
+    """
+    def __init__(self, documents: List[Document], vectorstore: "FAISS", version: str,
+                 lexical_index: Optional[BM25Index] = None):
+        self.documents = documents
+        self.vectorstore = vectorstore
+        self.version = version
+        self.lexical_index = lexical_index
+        self.base_retriever = vectorstore.as_retriever(
+            search_type="similarity_score_threshold",
+            search_kwargs={
+                "k": settings.TOP_K_RETRIEVAL,
+                "score_threshold": settings.SIMILARITY_THRESHOLD, 
+            }
+        )
+        self.faq_index = self._build_faq_index(documents)
+        self.category_indexes = CategorySubIndexes(vectorstore) if settings.CATEGORY_SUBINDEX_ENABLED else None
+        self._category_classifier = None
+        self._classifier_lock = threading.Lock()
+
+    @property
+    def category_classifier(self) -> EmbeddingCategoryClassifier:
+        """延遲建立的本地分類器 (第一次使用時計算各分類質心)"""
+        if self._category_classifier is None:
+            with self._classifier_lock:
+                if self._category_classifier is None:
+                    self._category_classifier = EmbeddingCategoryClassifier(
+                        self.vectorstore,
+                        min_score=settings.LOCAL_CLASSIFIER_MIN_SCORE,
+                        min_margin=settings.LOCAL_CLASSIFIER_MIN_MARGIN
+                    )
+        return self._category_classifier
+
+    @staticmethod
+    def _build_faq_index(documents: List[Document]) -> Dict[str, Document]:
+        """正規化問題 -> 文件 的雜湊索引；同一問題對應多個不同答案時視為模糊而排除"""
+        index: Dict[str, Document] = {}
+        ambiguous = set()
+        for doc in documents:
+            key = normalize_question(doc.page_content.replace('問題:', '', 1))
+            if not key or key in ambiguous:
+                continue
+            existing = index.get(key)
+            if existing is not None and existing.metadata.get("answer") != doc.metadata.get("answer"):
+                del index[key]
+                ambiguous.add(key)
+                continue
+            index[key] = doc
+        return index
+
 class RAGComponents:
-    def __init__(self):
+    def __init__(self, lazy: bool = False):
+        """
+        lazy=True 時只建立輕量的欄位，模型與知識庫由呼叫端以 load() / aload() 載入
+        (API 啟動時於背景載入，先接受 liveness 探測)。
+        """
         logger.info("Initializing RAG system components...")
-        self.documents = []
-        self.vectorstore = None
-        self.base_retriever = None
+        self.kb: Optional[KnowledgeBaseIndex] = None
+        self.embeddings = None
+        self.rerank_compressor = None
         self.reranking_retriever = None
         self.llm_rewriter = None
         self.llm_generator = None
         self.tools = [calculate_vacation_pay, calculate_unused_overtime_pay]
+        # FAISS 檢索與 Cross-Encoder 為 CPU 密集運算，交由有上限的執行緒池處理，避免阻塞 event loop
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.CPU_EXECUTOR_WORKERS,
+            thread_name_prefix="rag-cpu"
+        )
+        # 避免同時進行多個知識庫重建
+        self._reload_lock = threading.Lock()
+        # 重複問題與重試迴圈的查詢向量、(query, 文件) 分數快取
+        self.query_embedding_cache = LRUCache(settings.QUERY_EMBEDDING_CACHE_SIZE)
+        self.rerank_score_cache = LRUCache(settings.RERANK_SCORE_CACHE_SIZE)
+        # 各元件載入狀態：pending / loading / ready / failed，與載入秒數
+        self.component_status: Dict[str, dict] = {name: {"status": "pending"} for name in COMPONENTS}
         
-        self._load_data()
-        self._setup_vectorstore()
-        self._setup_reranker()
-        self._setup_llms()
-        
+        if not lazy:
+            self.load()
     
-    def _load_data(self):
-        """載入並處理資料"""
+    @property
+    def ready(self) -> bool:
+        """檢索所需的元件 (Embedding、知識庫、Reranker) 皆已載入"""
+        return all(self.component_status[name]["status"] == "ready" for name in ("embeddings", "knowledge_base", "reranker"))
+    
+    def _track(self, name: str, func: Callable, *args):
+        """執行元件載入並記錄狀態與耗時"""
+        status = self.component_status[name]
+        status.update(status="loading")
+        start = time.perf_counter()
         try:
-            data_path = settings.get_absolute_data_path()
-            logger.info(f"Loading data from: {data_path}")
-            data = pd.read_csv(data_path, usecols=['question', 'answer', 'category'])
-            
-            self.documents = []
-            for _, row in data.iterrows():
-                if not isinstance(row["question"], str):
-                    continue
-                self.documents.append(
-                    Document(
-                        page_content=f"問題: {row['question']}",
-                        metadata={
-                            "answer": row["answer"],
-                            "category": row.get("category", "other")
-                        }
-                    )
-                )
-            
-            logger.info(f"Knowledge base loaded with {len(self.documents)} records")
+            result = func(*args)
         except Exception as e:
-            logger.error(f"Failed to load data: {e}")
-            # Raise or handle error appropriately
+            status.update(status="failed", error=str(e))
+            logger.error(f"Failed to load {name}: {e}")
+            raise
+        status.update(status="ready", seconds=round(time.perf_counter() - start, 2))
+        logger.info(f"{name} ready in {status['seconds']:.2f}s")
+        return result
     
-    def _setup_vectorstore(self):
-        """建立向量資料庫"""
+    def load(self):
+        """
+        平行載入各元件：Embedding 模型、CSV 解析與索引鍵計算、Cross-Encoder、LLM client 同時進行，
+        向量資料庫於 Embedding 模型與文件皆就緒後建立 (或從磁碟載入)。
+        """
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=settings.MODEL_LOAD_WORKERS, thread_name_prefix="rag-load") as pool:
+            # 模型載入前設定執行緒數 (會匯入 torch，一併移到背景執行緒)
+            threads = pool.submit(configure_threads)
+            documents = pool.submit(self._load_documents_with_key)
+            threads.result()
+            embeddings = pool.submit(self._track, "embeddings", self._setup_embeddings)
+            reranker = pool.submit(self._track, "reranker", self._setup_reranker)
+            llm = pool.submit(self._track, "llm", self._setup_llms)
+            embeddings.result()
+            self._track("knowledge_base", lambda: self._setup_vectorstore(*documents.result()))
+            reranker.result()
+            self._link_reranker()
+            llm.result()
+        logger.info(f"RAG system components initialization complete in {time.perf_counter() - start:.2f}s")
+    
+    async def aload(self):
+        """非同步版本的 load (於獨立執行緒中執行，不阻塞 event loop)"""
+        await asyncio.to_thread(self.load)
+    
+    def warm_up(self):
+        """
+        以假資料跑一次 Embedding 與 Cross-Encoder (載入權重到快取、建立 ONNX / torch 執行計畫)，
+        並預先計算本地分類器的各分類質心，避免首個請求承擔這些延遲。
+        """
+        start = time.perf_counter()
+        self.embeddings.embed_query("暖機")
+        self.rerank_compressor.model.score([("暖機", "暖機")])
+        if settings.LOCAL_CLASSIFIER_ENABLED and self.kb is not None:
+            self.kb.category_classifier
+        logger.info(f"Local models warmed up in {time.perf_counter() - start:.2f}s")
+    
+    async def aping_llm(self) -> bool:
+        """
+        對 Ollama 送出空白 prompt：讓模型載入記憶體並以 keep_alive 保留，首個請求不需等待模型載入。
+        Ollama 無法連線時只記錄警告 (不影響檢索元件的 readiness)。
+        """
+        try:
+            from ollama import AsyncClient
+            start = time.perf_counter()
+            await AsyncClient(host=settings.OLLAMA_BASE_URL).generate(
+                model=settings.OLLAMA_MODEL, prompt="", keep_alive=settings.OLLAMA_KEEP_ALIVE
+            )
+            self.component_status["llm"].update(status="ready", warm=True)
+            logger.info(f"Ollama model {settings.OLLAMA_MODEL} loaded in {time.perf_counter() - start:.2f}s")
+            return True
+        except Exception as e:
+            self.component_status["llm"].update(warm=False, error=str(e))
+            logger.warning(f"Ollama keep-alive ping failed: {e}")
+            return False
+        
+    @property
+    def documents(self) -> List[Document]:
+        return self.kb.documents if self.kb else []
+
+    @property
+    def vectorstore(self) -> Optional["FAISS"]:
+        return self.kb.vectorstore if self.kb else None
+
+    @property
+    def base_retriever(self):
+        return self.kb.base_retriever if self.kb else None
+
+    @property
+    def kb_version(self) -> str:
+        """目前知識庫版本 (索引鍵值)，供快取判斷是否失效"""
+        return self.kb.version if self.kb else ""
+    
+    def _load_data(self) -> List[Document]:
+        """
+        載入並處理資料。讀取失敗 (檔案不存在、格式錯誤) 時直接拋出例外，
+        由呼叫端回報錯誤 (重新載入時保留目前的知識庫)。
+        """
+        data_path = settings.get_absolute_data_path()
+        logger.info(f"Loading data from: {data_path}")
+        documents = load_documents(data_path)
+        logger.info(f"Knowledge base loaded with {len(documents)} records")
+        return documents
+    
+    def _load_documents_with_key(self) -> Tuple[List[Document], str]:
+        """計算索引鍵並載入文件 (不需要 Embedding 模型，可與模型載入並行)"""
+        data_path = settings.get_absolute_data_path()
+        key = compute_index_key(data_path)
+        return self._load_data(), key
+    
+    def _build_knowledge_base(self, documents: Optional[List[Document]] = None, key: Optional[str] = None) -> KnowledgeBaseIndex:
+        """載入資料並建立 (或載入) 向量資料庫快照"""
+        data_path = settings.get_absolute_data_path()
+        if documents is None:
+            documents, key = self._load_documents_with_key()
+        if not documents:
+            # 須在建立索引前檢查，空的向量無法決定索引維度
+            raise RuntimeError(f"Knowledge base is empty: no records in {data_path}")
+        vectorstore = load_or_build_vectorstore(documents, self.embeddings, data_path, key=key)
+        lexical_index = load_or_build_lexical_index(documents, key) if settings.HYBRID_SEARCH_ENABLED else None
+        return KnowledgeBaseIndex(documents, vectorstore, key, lexical_index)
+    
+    def _setup_embeddings(self):
+        logger.info("Loading embedding model...")
+        self.embeddings = load_embeddings()
+    
+    def _setup_vectorstore(self, documents: Optional[List[Document]] = None, key: Optional[str] = None):
+        """建立向量資料庫 (優先載入磁碟上的索引)"""
         logger.info("Building vector store...")
-        embeddings = HuggingFaceEmbeddings(model_name=settings.EMBEDDING_MODEL)
-        self.vectorstore = FAISS.from_documents(self.documents, embeddings)
-        self.base_retriever = self.vectorstore.as_retriever(
-            search_type="similarity_score_threshold",
-            search_kwargs={
-                "k": settings.TOP_K_RETRIEVAL,
-                "score_threshold": settings.SIMILARITY_THRESHOLD, 
-            }
-        )
+        self.kb = self._build_knowledge_base(documents, key)
         logger.info("Vector store built successfully")
     
+    def reload_knowledge_base(self, force: bool = False) -> bool:
+        """
+        於背景重建知識庫並以單一賦值原子性替換。
+        CSV 與設定未變更時 (版本相同) 不做任何事，回傳是否有替換。
+        """
+        with self._reload_lock:
+            data_path = settings.get_absolute_data_path()
+            if not force and compute_index_key(data_path) == self.kb_version:
+                logger.info("Knowledge base unchanged, skipping reload")
+                return False
+            
+            logger.info("Reloading knowledge base...")
+            # 讀取失敗或資料為空時拋出例外，目前的知識庫維持不變
+            new_kb = self._build_knowledge_base()
+            
+            old_version = self.kb_version
+            self.kb = new_kb
+            # 知識庫版本變更，使檢索相關快取失效
+            self.query_embedding_cache.clear()
+            self.rerank_score_cache.clear()
+            if self.reranking_retriever is not None:
+                self._link_reranker()
+            logger.info(f"Knowledge base swapped: {old_version} -> {new_kb.version} ({len(new_kb.documents)} records)")
+            return True
+    
     def _setup_reranker(self):
         """設定 Reranker"""
+        from langchain_classic.retrievers.document_compressors import CrossEncoderReranker
         logger.info("Setting up Reranker...")
-        reranker_model = HuggingFaceCrossEncoder(
-            model_name=settings.RERANKER_MODEL
-        )
-        rerank_compressor = CrossEncoderReranker(
+        reranker_model = load_cross_encoder()
+        self.rerank_compressor = CrossEncoderReranker(
             model=reranker_model, 
             top_n=settings.TOP_N_RERANK
         )
+        logger.info("Reranker setup complete")
+    
+    def _link_reranker(self):
+        """以目前知識庫的 retriever 建立 Rerank retriever (Reranker 與知識庫皆就緒後)"""
+        from langchain_classic.retrievers import ContextualCompressionRetriever
         self.reranking_retriever = ContextualCompressionRetriever(
-            base_compressor=rerank_compressor,
+            base_compressor=self.rerank_compressor,
             base_retriever=self.base_retriever
         )
-        logger.info("Reranker setup complete")
+    
     def _setup_llms(self):
         """設定 LLM"""
+        from langchain_ollama import OllamaLLM, ChatOllama
         logger.info("Setting up LLMs...")
         
         self.llm_rewriter = OllamaLLM(
@@ -104,52 +304,204 @@ class RAGComponents:
         ).bind_tools(self.tools)
         
         logger.info("LLMs setup complete")
-        logger.info("RAG system components initialization complete")
         
     def search(self, query: str, category: str = None) -> List[Document]:
         """
         執行初步檢索 (Vector Search)
         """
         logger.info(f"Initial search: {query} (Category: {category})")
+        # 取得當下的知識庫快照，避免檢索途中被替換
+        kb = self.kb
+        # 使用快取的查詢向量 (重試迴圈與重複問題不需重新 embedding)
+        query_vector = self.embed_query(query)
         
-        if category and category != "other":
+        if category and category != "other" and kb.category_indexes is not None:
+            docs = self._search_category(kb, query_vector, category)
+        elif category and category != "other":
             logger.debug(f"Applying filter: category='{category}'")
-            docs = self.vectorstore.similarity_search(
-                query, 
+            docs = kb.vectorstore.similarity_search_by_vector(
+                query_vector, 
                 k=settings.TOP_K_RETRIEVAL,
                 filter={"category": category}
             )
         else:
-            docs = self.base_retriever.invoke(query)
+            # 與 base_retriever 的 similarity_score_threshold 相同邏輯
+            relevance_fn = kb.vectorstore._select_relevance_score_fn()
+            results = kb.vectorstore.similarity_search_with_score_by_vector(query_vector, k=settings.TOP_K_RETRIEVAL)
+            docs = [doc for doc, distance in results if relevance_fn(distance) >= settings.SIMILARITY_THRESHOLD]
+        
+        if kb.lexical_index is not None:
+            docs = self._fuse_lexical(kb, query, docs, category)
         
         logger.info(f"Found {len(docs)} documents")
-        # 打印文件內容
-        for i, doc in enumerate(docs):
-            logger.debug(f"Doc {i}: {doc.page_content}")
+        annotate(retrieved_ids=doc_ids(docs))
+        return docs
+
+    def _search_category(self, kb: KnowledgeBaseIndex, query_vector: List[float], category: str) -> List[Document]:
+        """
+        在分類子索引 (ANN 索引為 selector) 中檢索；分類結果不足 TOP_K_RETRIEVAL 筆時，
+        以全域索引的結果 (去除重複) 補足。
+        """
+        k = settings.TOP_K_RETRIEVAL
+        logger.debug(f"Searching category: category='{category}' ({kb.category_indexes.size(category)} docs)")
+        docs = [doc for doc, _ in kb.category_indexes.search(category, query_vector, k)]
+        if len(docs) < k:
+            seen = {doc.id for doc in docs}
+            fallback = kb.vectorstore.similarity_search_by_vector(query_vector, k=k)
+            docs.extend(doc for doc in fallback if doc.id not in seen)
+            docs = docs[:k]
+            logger.debug(f"Category '{category}' is sparse, filled to {len(docs)} docs from the global index")
         return docs
 
-    def rerank(self, documents: List[Document], query: str) -> List[Document]:
+    def _fuse_lexical(self, kb: KnowledgeBaseIndex, query: str, dense_docs: List[Document],
+                      category: str = None) -> List[Document]:
         """
-        執行重排序 (Rerank)
+        以 BM25 檢索補上逐字出現的關鍵詞命中，並與向量檢索結果做 Reciprocal Rank Fusion
+        """
+        category = category if category and category != "other" else None
+        lexical_ids = [doc_id for doc_id, _ in kb.lexical_index.search(query, settings.BM25_TOP_K, category)]
+        if not lexical_ids:
+            return dense_docs
+        
+        by_id = {doc.id: doc for doc in dense_docs}
+        for doc_id in lexical_ids:
+            if doc_id not in by_id:
+                doc = kb.vectorstore.docstore.search(doc_id)
+                if isinstance(doc, Document):
+                    by_id[doc_id] = doc
+        fused = reciprocal_rank_fusion([[doc.id for doc in dense_docs], lexical_ids], settings.RRF_K)
+        docs = [by_id[doc_id] for doc_id in fused if doc_id in by_id][:settings.TOP_K_RETRIEVAL]
+        logger.debug(f"Hybrid search: {len(dense_docs)} dense + {len(lexical_ids)} BM25 -> {len(docs)} fused")
+        return docs
+
+    def rerank(self, documents: List[Document], query: str) -> Tuple[List[Document], List[float]]:
+        """
+        執行重排序 (Rerank)，回傳前 TOP_N_RERANK 筆文件與其 Cross-Encoder 分數
         """
         if not documents:
-            return []
+            return [], []
             
         logger.info(f"Reranking {len(documents)} documents...")
-        # CrossEncoderReranker expects (document, score) or similar but the compressor takes docs and query
-        # compress_documents returns Sequence[Document]
-        reranked_docs = self.reranking_retriever.base_compressor.compress_documents(documents, query)
+        # CrossEncoderReranker.compress_documents 會丟棄分數，這裡直接呼叫模型計分
+        # 只對快取未命中的 (query, 文件) 組合計分
+        query_key = normalize_cache_key(query)
+        keys = [(settings.RERANKER_MODEL, settings.INFERENCE_BACKEND, query_key, doc.page_content) for doc in documents]
+        scores = [self.rerank_score_cache.get(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            with span("model", "cross_encoder", pairs=len(missing)):
+                new_scores = self.rerank_compressor.model.score([(query, documents[i].page_content) for i in missing])
+            for i, score in zip(missing, new_scores):
+                scores[i] = float(score)
+                self.rerank_score_cache.put(keys[i], scores[i])
+        logger.debug(f"Rerank score cache: {len(documents) - len(missing)}/{len(documents)} hits")
+        ranked = sorted(zip(documents, scores), key=lambda x: x[1], reverse=True)[:settings.TOP_N_RERANK]
+        reranked_docs = [doc for doc, _ in ranked]
+        rerank_scores = [float(score) for _, score in ranked]
         
-        logger.info(f"Retained {len(reranked_docs)} documents after reranking")
-        for i, doc in enumerate(reranked_docs):
-            logger.debug(f"Reranked Doc {i}: {doc.page_content}")
-        return reranked_docs
+        logger.info(f"Retained {len(reranked_docs)} documents after reranking (scores: {[round(s, 3) for s in rerank_scores]})")
+        annotate(rerank_cache_hits=len(documents) - len(missing))
+        return reranked_docs, rerank_scores
 
     def retrieve(self, query: str, category: str = None) -> List[Document]:
         """
         執行完整檢索與 Rerank (Backward Compatibility)
         """
         docs = self.search(query, category)
-        return self.rerank(docs, query)
+        reranked_docs, _ = self.rerank(docs, query)
+        return reranked_docs
+
+    def match_faq(self, query: str) -> Optional[Document]:
+        """
+        以正規化問題做 O(1) 精確比對，命中時回傳知識庫中的文件
+        """
+        return self.kb.faq_index.get(normalize_question(query)) if self.kb else None
+
+    def classify_category(self, query: str) -> Optional[Tuple[str, float, str]]:
+        """
+        本地分類 (關鍵字規則 + 分類質心)，信心不足時回傳 None
+        """
+        kb = self.kb
+        if kb is None:
+            return None
+        return kb.category_classifier.classify(query, self.embed_query(query))
+
+    def kb_similarity(self, query: str) -> float:
+        """
+        查詢與知識庫最相近問題的相關度分數 (與 SIMILARITY_THRESHOLD 相同尺度)
+        """
+        kb = self.kb
+        if kb is None or kb.vectorstore.index.ntotal == 0:
+            return 0.0
+        results = kb.vectorstore.similarity_search_with_score_by_vector(self.embed_query(query), k=1)
+        if not results:
+            return 0.0
+        relevance_fn = kb.vectorstore._select_relevance_score_fn()
+        return float(relevance_fn(results[0][1]))
+
+    def embed_query(self, text: str) -> List[float]:
+        """以已載入的 Embedding 模型計算查詢向量 (LRU 快取)"""
+        key = (embedding_model_id(), normalize_cache_key(text))
+        vector = self.query_embedding_cache.get(key)
+        if vector is None:
+            with span("model", "embedding"):
+                vector = self.embeddings.embed_query(text)
+            self.query_embedding_cache.put(key, vector)
+        return vector
+
+    def cache_stats(self) -> dict:
+        """查詢向量與 Cross-Encoder 分數快取統計"""
+        return {
+            "query_embedding": self.query_embedding_cache.stats(),
+            "rerank_score": self.rerank_score_cache.stats(),
+        }
+
+    async def _run_in_executor(self, func, *args):
+        """在 CPU 執行緒池中執行同步函數 (沿用目前的 context，追蹤 span 才能對應到所屬請求與節點)"""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, functools.partial(context.run, func, *args))
+
+    async def asearch(self, query: str, category: str = None) -> List[Document]:
+        """
+        非同步版本的 search (於執行緒池中執行)
+        """
+        return await self._run_in_executor(self.search, query, category)
+
+    async def arerank(self, documents: List[Document], query: str) -> Tuple[List[Document], List[float]]:
+        """
+        非同步版本的 rerank (於執行緒池中執行)
+        """
+        if not documents:
+            return [], []
+        return await self._run_in_executor(self.rerank, documents, query)
+
+    async def aclassify_category(self, query: str) -> Optional[Tuple[str, float, str]]:
+        """
+        非同步版本的 classify_category (於執行緒池中執行)
+        """
+        return await self._run_in_executor(self.classify_category, query)
+
+    async def akb_similarity(self, query: str) -> float:
+        """
+        非同步版本的 kb_similarity (於執行緒池中執行)
+        """
+        return await self._run_in_executor(self.kb_similarity, query)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """
+        非同步版本的 embed_query (於執行緒池中執行)
+        """
+        return await self._run_in_executor(self.embed_query, text)
+
+    async def areload_knowledge_base(self, force: bool = False) -> bool:
+        """
+        非同步版本的 reload_knowledge_base (於獨立執行緒中執行，不佔用檢索執行緒池)
+        """
+        return await asyncio.to_thread(self.reload_knowledge_base, force)
+
+    def shutdown(self):
+        """釋放執行緒池資源"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
     
 
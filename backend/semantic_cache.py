@@ -0,0 +1,115 @@
+import re
+import time
+import threading
+import logging
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 數量 + 單位 (比對前先 NFKC、去除空白並轉小寫，「3 天」、「45k」、「4萬5」、「5h30m」皆會命中)
+_DIGIT_PATTERN = re.compile(r"[0-9零一二兩三四五六七八九十百千萬]+(?:[天小時分鐘元塊萬千個]|hrs?|h|min|m|k)")
+# graph 的 error 狀態：守衛放行 (pass) 或檢索驗證通過 (yes) 才代表答案有相關文件支持
+_CACHEABLE_STATES = {None, "", "pass", "yes"}
+
+
+class SemanticCache:
+    """
+    以查詢向量為鍵值的語意答案快取 (位於整個 graph 之前)。
+
+    - 相似度 (cosine) 超過門檻即視為命中，直接回傳已優化的答案與參考資料
+    - LRU + TTL 淘汰
+    - 每筆資料標記知識庫版本，知識庫更新後自動失效
+    """
+
+    def __init__(self, threshold: float, max_entries: int, ttl_seconds: float):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, dict]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm > 0 else v
+
+    @staticmethod
+    def is_cacheable(query: str, result: dict) -> bool:
+        """
+        只快取與個人數值無關、且有相關文件支持的答案：
+        被攔截、檢索不到相關內容 (no_content) 或驗證未通過 (no)、使用了計算工具、
+        經由快速路徑 (例如試算) 回答、或問題包含具體數量 (薪資、天數) 時不快取
+        """
+        if result.get("error") not in _CACHEABLE_STATES or result.get("tool_call_count", 0) > 0:
+            return False
+        if result.get("fast_path") or not result.get("final_answer"):
+            return False
+        normalized = "".join(unicodedata.normalize("NFKC", query or "").split()).lower()
+        return not _DIGIT_PATTERN.search(normalized)
+
+    def _evict_expired(self, kb_version: str):
+        now = time.time()
+        stale = [
+            entry_id for entry_id, entry in self._entries.items()
+            if entry["kb_version"] != kb_version or now - entry["created_at"] > self.ttl_seconds
+        ]
+        for entry_id in stale:
+            del self._entries[entry_id]
+
+    def lookup(self, vector: List[float], kb_version: str) -> Optional[dict]:
+        """回傳最相似且超過門檻的快取答案，否則回傳 None"""
+        query_vec = self._normalize(vector)
+        with self._lock:
+            self._evict_expired(kb_version)
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            ids = list(self._entries.keys())
+            matrix = np.stack([self._entries[i]["vector"] for i in ids])
+            scores = matrix @ query_vec
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            entry_id = ids[best]
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            entry = self._entries[entry_id]
+            logger.info(f"Semantic cache hit ({scores[best]:.3f}): {entry['query'][:50]}")
+            return entry["payload"]
+
+    def store(self, query: str, vector: List[float], payload: dict, kb_version: str):
+        """寫入快取，超過上限時淘汰最久未使用的資料"""
+        with self._lock:
+            self._entries[self._next_id] = {
+                "query": query,
+                "vector": self._normalize(vector),
+                "payload": payload,
+                "kb_version": kb_version,
+                "created_at": time.time(),
+            }
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
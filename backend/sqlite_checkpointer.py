@@ -0,0 +1,130 @@
+import os
+import time
+import logging
+import aiosqlite
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+logger = logging.getLogger(__name__)
+
+
+class PruningSqliteSaver(AsyncSqliteSaver):
+    """
+    SQLite (WAL) checkpointer：重啟後保留對話，並可由多個 worker 共用。
+    每次寫入後只保留該 thread 最新的 max_checkpoints_per_thread 個 checkpoint；
+    每 sweep_interval 秒移除閒置超過 ttl_seconds 或超出 max_threads 的 thread。
+    """
+
+    def __init__(self, conn: aiosqlite.Connection, db_path: str, max_threads: int,
+                 ttl_seconds: float, max_checkpoints_per_thread: int, sweep_interval: float):
+        super().__init__(conn)
+        self.db_path = db_path
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self._pruning_setup = False
+        self.counters = {"evicted_threads": 0, "pruned_checkpoints": 0}
+
+    @classmethod
+    async def open(cls, db_path: str, **kwargs) -> "PruningSqliteSaver":
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        conn = await aiosqlite.connect(db_path)
+        saver = cls(conn, db_path, **kwargs)
+        await saver.setup()
+        logger.info(f"SQLite checkpointer opened at {db_path}")
+        return saver
+
+    async def setup(self):
+        await super().setup()
+        if self._pruning_setup:
+            return
+        async with self.lock:
+            await self.conn.execute("PRAGMA journal_mode=WAL")
+            # WAL 模式下 NORMAL 已可避免資料庫損毀，只可能遺失最後一筆交易
+            await self.conn.execute("PRAGMA synchronous=NORMAL")
+            await self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS thread_access (thread_id TEXT PRIMARY KEY, last_access REAL NOT NULL)"
+            )
+            await self.conn.commit()
+        self._pruning_setup = True
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        next_config = await super().aput(config, checkpoint, metadata, new_versions)
+        await self._prune_thread(config["configurable"]["thread_id"], config["configurable"].get("checkpoint_ns", ""))
+        if time.monotonic() - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = time.monotonic()
+            await self._sweep()
+        return next_config
+
+    async def _prune_thread(self, thread_id: str, checkpoint_ns: str):
+        async with self.lock:
+            await self.conn.execute(
+                "INSERT INTO thread_access (thread_id, last_access) VALUES (?, ?) "
+                "ON CONFLICT(thread_id) DO UPDATE SET last_access = excluded.last_access",
+                (thread_id, time.time())
+            )
+            if self.max_checkpoints_per_thread > 0:
+                # checkpoint id 為依時間遞增的 uuid6，保留最新的 N 個
+                cursor = await self.conn.execute(
+                    "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id NOT IN ("
+                    "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT ?)",
+                    (thread_id, checkpoint_ns, thread_id, checkpoint_ns, self.max_checkpoints_per_thread)
+                )
+                if cursor.rowcount > 0:
+                    self.counters["pruned_checkpoints"] += cursor.rowcount
+                    await self.conn.execute(
+                        "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id NOT IN ("
+                        "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?)",
+                        (thread_id, checkpoint_ns, thread_id, checkpoint_ns)
+                    )
+            await self.conn.commit()
+
+    async def _sweep(self):
+        """移除過期 (TTL) 與超出 max_threads (最久未使用) 的 thread"""
+        async with self.lock:
+            expired = []
+            if self.ttl_seconds > 0:
+                async with self.conn.execute(
+                    "SELECT thread_id FROM thread_access WHERE last_access < ?",
+                    (time.time() - self.ttl_seconds,)
+                ) as cursor:
+                    expired.extend(row[0] for row in await cursor.fetchall())
+            if self.max_threads > 0:
+                async with self.conn.execute(
+                    "SELECT thread_id FROM thread_access ORDER BY last_access DESC LIMIT -1 OFFSET ?",
+                    (self.max_threads,)
+                ) as cursor:
+                    expired.extend(row[0] for row in await cursor.fetchall())
+            expired = list(dict.fromkeys(expired))
+            if not expired:
+                return
+            params = [(thread_id,) for thread_id in expired]
+            for table in ("checkpoints", "writes", "thread_access"):
+                await self.conn.executemany(f"DELETE FROM {table} WHERE thread_id = ?", params)
+            await self.conn.commit()
+            self.counters["evicted_threads"] += len(expired)
+        logger.info(f"Evicted {len(expired)} idle conversation threads from the checkpointer")
+
+    async def astats(self) -> dict:
+        async with self.lock:
+            counts = {}
+            for table in ("thread_access", "checkpoints", "writes"):
+                async with self.conn.execute(f"SELECT COUNT(*) FROM {table}") as cursor:
+                    counts[table] = (await cursor.fetchone())[0]
+        db_bytes = sum(
+            os.path.getsize(path) for path in (self.db_path, f"{self.db_path}-wal") if os.path.exists(path)
+        )
+        return {
+            "backend": "sqlite",
+            "threads": counts["thread_access"],
+            "checkpoints": counts["checkpoints"],
+            "writes": counts["writes"],
+            "db_bytes": db_bytes,
+            "max_threads": self.max_threads,
+            **self.counters,
+        }
+
+    async def aclose(self):
+        await self.conn.close()
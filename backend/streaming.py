@@ -0,0 +1,118 @@
+import json
+import re
+from typing import AsyncIterator, Optional
+
+# 會向前端回報進度的節點
+PROGRESS_NODES = {
+    "fused_frontend": "理解問題中...",
+    "speculative_frontend": "理解問題中...",
+    "guardrail": "安全檢查中...",
+    "rewrite": "理解問題中...",
+    "classify_query": "分類問題中...",
+    "retrieve": "檢索規章中...",
+    "rerank": "排序相關資料中...",
+    "clarify": "確認資料中...",
+    "no_context": "確認資料中...",
+    "generate": "撰寫回答中...",
+    "tools": "計算中...",
+    "optimize_response": "潤飾回答中...",
+}
+
+# 會串流回答 token 的節點
+TOKEN_NODES = {"generate", "optimize_response"}
+
+
+def format_sse(event: str, data: dict) -> str:
+    """將事件格式化為 Server-Sent Events 字串"""
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+class JsonFieldStreamer:
+    """
+    從逐步產生的 JSON 文字中，增量取出指定字串欄位的內容。
+
+    optimize_response 使用 format="json" 的模型，輸出為 {"optimized_answer": "..."}，
+    此類別讓我們在 JSON 尚未完整前就能把欄位內容串流給使用者。
+    """
+
+    _ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+    def __init__(self, field: str):
+        self._key_pattern = re.compile(r'"' + re.escape(field) + r'"\s*:\s*"')
+        self._buffer = ""
+        self._pos = 0
+        self._in_value = False
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        """輸入新的文字片段，回傳新解出的欄位內容"""
+        if self.done or not chunk:
+            return ""
+        self._buffer += chunk
+
+        if not self._in_value:
+            match = self._key_pattern.search(self._buffer)
+            if not match:
+                return ""
+            self._in_value = True
+            self._pos = match.end()
+
+        out = []
+        buf = self._buffer
+        while self._pos < len(buf):
+            ch = buf[self._pos]
+            if ch == '"':
+                self.done = True
+                break
+            if ch != '\\':
+                out.append(ch)
+                self._pos += 1
+                continue
+            # 跳脫字元：資料不完整時等待下一個片段
+            if self._pos + 1 >= len(buf):
+                break
+            esc = buf[self._pos + 1]
+            if esc == 'u':
+                if self._pos + 6 > len(buf):
+                    break
+                try:
+                    out.append(chr(int(buf[self._pos + 2:self._pos + 6], 16)))
+                except ValueError:
+                    pass
+                self._pos += 6
+            else:
+                out.append(self._ESCAPES.get(esc, esc))
+                self._pos += 2
+        return "".join(out)
+
+
+async def stream_query_events(graph, initial_state: dict, config: dict, converter) -> AsyncIterator[str]:
+    """
+    執行 LangGraph 並以 SSE 格式輸出節點進度與回答 token。
+
+    事件種類：
+    - progress: {"node": 節點名稱, "message": 說明}
+    - token: {"node": 節點名稱, "text": 繁體中文片段}
+
+    最終結果 (done) 由呼叫端在串流結束後從 checkpointer 讀取狀態產生。
+    """
+    optimize_streamer: Optional[JsonFieldStreamer] = None
+
+    async for event in graph.astream_events(initial_state, config=config, version="v2"):
+        kind = event["event"]
+        node = event.get("metadata", {}).get("langgraph_node")
+
+        if kind == "on_chain_start" and event.get("name") in PROGRESS_NODES and event["name"] == node:
+            if node == "optimize_response":
+                optimize_streamer = JsonFieldStreamer("optimized_answer")
+            yield format_sse("progress", {"node": node, "message": PROGRESS_NODES[node]})
+
+        elif kind == "on_chat_model_stream" and node in TOKEN_NODES:
+            chunk = event["data"]["chunk"]
+            text = chunk.content if isinstance(chunk.content, str) else ""
+            if node == "optimize_response" and optimize_streamer is not None:
+                text = optimize_streamer.feed(text)
+            if text:
+                # 逐片段轉為繁體中文
+                yield format_sse("token", {"node": node, "text": converter.convert(text)})
@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import uuid
+import queue
+import logging
+import logging.handlers
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from .config import settings
+
+# 追蹤紀錄獨立於一般日誌，不輸出到 stdout
+trace_logger = logging.getLogger("rag.trace")
+trace_logger.propagate = False
+trace_logger.setLevel(logging.INFO)
+
+# 目前請求 (request_id, thread_id) 與目前的 span (供 annotate 附加屬性)
+_trace_context: ContextVar[Optional[dict]] = ContextVar("trace_context", default=None)
+_current_span: ContextVar[Optional[dict]] = ContextVar("trace_span", default=None)
+
+
+class JsonLineFormatter(logging.Formatter):
+    """將 span 轉為一行 JSON (於背景寫入執行緒中序列化，不佔用請求路徑)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(getattr(record, "span", {"message": record.getMessage()}), ensure_ascii=False, default=str)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """佇列已滿 (寫入跟不上) 時丟棄 span，不阻塞請求"""
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # span 已是 dict，不需在請求路徑上格式化訊息
+        return record
+
+
+def setup_tracing() -> Optional[logging.handlers.QueueListener]:
+    """
+    TRACE_ENABLED 時建立非同步的 JSONL 追蹤輸出：請求路徑只把 span 放入佇列，
+    由 QueueListener 執行緒寫入輪替的 JSONL 檔。回傳 listener，關閉時需呼叫 stop()。
+    """
+    if not settings.TRACE_ENABLED:
+        return None
+    path = settings.get_absolute_trace_log_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    file_handler = logging.handlers.RotatingFileHandler(
+        path,
+        maxBytes=settings.TRACE_MAX_BYTES,
+        backupCount=settings.TRACE_BACKUP_COUNT,
+        encoding="utf-8"
+    )
+    file_handler.setFormatter(JsonLineFormatter())
+    span_queue: queue.Queue = queue.Queue(maxsize=settings.TRACE_QUEUE_SIZE)
+    trace_logger.handlers = [_DroppingQueueHandler(span_queue)]
+    listener = logging.handlers.QueueListener(span_queue, file_handler, respect_handler_level=False)
+    listener.start()
+    logging.getLogger(__name__).info(f"Tracing enabled, writing spans to {path}")
+    return listener
+
+
+def start_trace(thread_id: str) -> str:
+    """開始追蹤一個請求，回傳 request_id"""
+    request_id = uuid.uuid4().hex[:16]
+    _trace_context.set({"request_id": request_id, "thread_id": thread_id})
+    return request_id
+
+
+def _emit(kind: str, name: str, start_ts: float, duration: float, status: str, attributes: Dict[str, Any]):
+    context = _trace_context.get() or {}
+    trace_logger.info("", extra={"span": {
+        "ts": datetime.fromtimestamp(start_ts, timezone.utc).isoformat(timespec="milliseconds"),
+        "request_id": context.get("request_id"),
+        "thread_id": context.get("thread_id"),
+        "kind": kind,
+        "name": name,
+        "duration_ms": round(duration * 1000, 3),
+        "status": status,
+        **({"attributes": attributes} if attributes else {}),
+    }})
+
+
+@contextmanager
+def span(kind: str, name: str, **attributes) -> Iterator[Optional[dict]]:
+    """
+    記錄一個 span (kind: request / node / model / llm)。yield 的 dict 可再加入屬性；
+    區塊內呼叫 annotate() 也會加到此 span。未啟用追蹤時幾乎沒有額外成本。
+    """
+    if not settings.TRACE_ENABLED:
+        yield None
+        return
+    attrs = dict(attributes)
+    token = _current_span.set(attrs)
+    start_ts = time.time()
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield attrs
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # 串流中斷時 generator 可能在不同的 context 中關閉
+            pass
+        _emit(kind, name, start_ts, time.perf_counter() - start, status, attrs)
+
+
+def annotate(**attributes):
+    """附加屬性到目前的 span (例如文件 id 與分數)"""
+    current = _current_span.get()
+    if current is not None:
+        current.update(attributes)
+
+
+def doc_ids(documents) -> list:
+    return [doc.id for doc in documents]
+
+
+class TraceCallbackHandler(BaseCallbackHandler):
+    """以 LangChain callback 記錄每次 LLM 呼叫的 span (所屬節點、耗時、token 數)"""
+
+    # 在 event loop 中直接執行，不另外排入執行緒池
+    run_inline = True
+
+    def __init__(self):
+        self._runs: Dict[UUID, tuple] = {}
+
+    def _start(self, run_id: UUID, metadata: Optional[dict]):
+        node = (metadata or {}).get("langgraph_node", "")
+        self._runs[run_id] = (time.time(), time.perf_counter(), node)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata: Optional[dict] = None, **kwargs):
+        self._start(run_id, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, metadata: Optional[dict] = None, **kwargs):
+        self._start(run_id, metadata)
+
+    def _finish(self, run_id: UUID, status: str, attributes: dict):
+        started = self._runs.pop(run_id, None)
+        if started is None:
+            return
+        start_ts, start, node = started
+        _emit("llm", node or "llm", start_ts, time.perf_counter() - start, status, attributes)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        attributes = {}
+        generations = response.generations[0] if response.generations else []
+        message = getattr(generations[0], "message", None) if generations else None
+        usage = getattr(message, "usage_metadata", None) or {}
+        if usage:
+            attributes["prompt_tokens"] = usage.get("input_tokens")
+            attributes["completion_tokens"] = usage.get("output_tokens")
+        if message is not None and getattr(message, "tool_calls", None):
+            attributes["tool_calls"] = [tc.get("name") for tc in message.tool_calls]
+        self._finish(run_id, "ok", attributes)
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        self._finish(run_id, "error", {"error": type(error).__name__})
+
+
+def trace_callbacks() -> list:
+    """graph config 用的 callbacks (未啟用追蹤時為空)"""
+    return [TraceCallbackHandler()] if settings.TRACE_ENABLED else []
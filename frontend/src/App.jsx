@@ -32,6 +32,7 @@ export default function ModernRAGChat() {
 
   const [input, setInput] = useState('');
   const [loading, setLoading] = useState(false);
+  const [loadingStage, setLoadingStage] = useState('');
   const [apiStatus, setApiStatus] = useState('checking');
   const [isSidebarOpen, setIsSidebarOpen] = useState(true);
   const messagesEndRef = useRef(null);
@@ -135,8 +136,10 @@ export default function ModernRAGChat() {
     setInput('');
     setLoading(true);
 
+    const timestamp = () => new Date().toLocaleTimeString('zh-TW', { hour: '2-digit', minute: '2-digit' });
+
     try {
-      const response = await fetch('http://localhost:8000/query', {
+      const response = await fetch('http://localhost:8000/query/stream', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
@@ -145,29 +148,87 @@ export default function ModernRAGChat() {
         })
       });
 
-      const data = await response.json();
+      if (!response.ok || !response.body) {
+        throw new Error(`HTTP ${response.status}`);
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder('utf-8');
+      let buffer = '';
+      let streamedContent = '';
+      let streamedNode = '';
+      let finished = false;
+
+      // 解析單一 SSE 事件
+      const handleEvent = (eventName, data) => {
+        if (eventName === 'progress') {
+          setLoadingStage(data.message);
+        } else if (eventName === 'token') {
+          // 從 generate 切換到 optimize_response 時，以優化後的內容重新開始
+          if (data.node !== streamedNode) {
+            streamedNode = data.node;
+            streamedContent = '';
+          }
+          streamedContent += data.text;
+          updateSessionMessages(activeId, [...updatedMessages, {
+            type: 'bot',
+            content: streamedContent,
+            streaming: true,
+            timestamp: timestamp()
+          }]);
+        } else if (eventName === 'done') {
+          finished = true;
+          const botMessage = {
+            type: 'bot',
+            content: data.answer,
+            rewritten_query: data.rewritten_query,
+            context: data.context,
+            timestamp: timestamp()
+          };
+          updateSessionMessages(activeId, [...updatedMessages, botMessage]);
+        } else if (eventName === 'error') {
+          throw new Error(data.error);
+        }
+      };
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+          const rawEvent = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+
+          let eventName = 'message';
+          let dataLines = [];
+          for (const line of rawEvent.split('\n')) {
+            if (line.startsWith('event:')) {
+              eventName = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+              dataLines.push(line.slice(5).trim());
+            }
+          }
+          if (dataLines.length > 0) {
+            handleEvent(eventName, JSON.parse(dataLines.join('\n')));
+          }
+        }
+      }
 
-      if (data.success) {
-        const botMessage = {
-          type: 'bot',
-          content: data.answer,
-          rewritten_query: data.rewritten_query,
-          context: data.context,
-          timestamp: new Date().toLocaleTimeString('zh-TW', { hour: '2-digit', minute: '2-digit' })
-        };
-        updateSessionMessages(activeId, [...updatedMessages, botMessage]);
-      } else {
-        throw new Error(data.error);
+      if (!finished) {
+        throw new Error('連線中斷');
       }
     } catch (error) {
       const errorMessage = {
         type: 'error',
         content: `抱歉，系統目前無法回應：${error.message}`,
-        timestamp: new Date().toLocaleTimeString('zh-TW', { hour: '2-digit', minute: '2-digit' })
+        timestamp: timestamp()
       };
       updateSessionMessages(activeId, [...updatedMessages, errorMessage]);
     } finally {
       setLoading(false);
+      setLoadingStage('');
     }
   };
 
@@ -276,7 +337,7 @@ export default function ModernRAGChat() {
                   {messages.map((msg, idx) => (
                     <ChatMessage key={idx} msg={msg} />
                   ))}
-                  {loading && <LoadingBubble />}
+                  {loading && !messages[messages.length - 1]?.streaming && <LoadingBubble stage={loadingStage} />}
                 </>
               )}
             </AnimatePresence>
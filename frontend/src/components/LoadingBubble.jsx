@@ -2,7 +2,7 @@ import React from 'react';
 import { motion } from 'framer-motion';
 import { Bot } from 'lucide-react';
 
-export function LoadingBubble() {
+export function LoadingBubble({ stage }) {
     return (
         <div className="flex gap-4">
             <div className="w-9 h-9 rounded-xl bg-gradient-to-br from-primary-500 to-primary-600 flex items-center justify-center shadow-lg shadow-primary-500/20">
@@ -17,6 +17,9 @@ export function LoadingBubble() {
                         className="w-2 h-2 bg-primary-400 rounded-full"
                     />
                 ))}
+                {stage && (
+                    <span className="ml-2 text-xs text-slate-400">{stage}</span>
+                )}
             </div>
         </div>
     );
@@ -0,0 +1,102 @@
+# python scripts/analyze_traces.py [--path backend/data/traces/trace.jsonl] [--top 10] [--kind node]
+import os
+import sys
+import glob
+import math
+import json
+import argparse
+import logging
+from collections import defaultdict
+
+# Ensure the project root is in sys.path
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+def trace_files(path):
+    """目前的檔案與輪替後的備份 (trace.jsonl, trace.jsonl.1, ...)"""
+    return sorted(p for p in glob.glob(f"{path}*") if os.path.isfile(p))
+
+def load_spans(paths):
+    spans = []
+    skipped = 0
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    spans.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # 寫入中的最後一行可能不完整
+                    skipped += 1
+    if skipped:
+        logger.warning(f"Skipped {skipped} malformed lines")
+    return spans
+
+def percentile(sorted_values, q):
+    """最近秩 (nearest-rank) 百分位數"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values), math.ceil(q / 100 * len(sorted_values))) - 1)
+    return sorted_values[index]
+
+def print_latency_table(spans, kinds):
+    durations = defaultdict(list)
+    errors = defaultdict(int)
+    for s in spans:
+        if s.get("kind") not in kinds:
+            continue
+        key = (s["kind"], s["name"])
+        durations[key].append(s["duration_ms"])
+        if s.get("status") == "error":
+            errors[key] += 1
+
+    print(f"{'kind':<8} {'name':<24} {'count':>7} {'errors':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'total s':>9}")
+    rows = sorted(durations.items(), key=lambda item: sum(item[1]), reverse=True)
+    for (kind, name), values in rows:
+        values.sort()
+        print(f"{kind:<8} {name:<24} {len(values):>7} {errors[(kind, name)]:>6} "
+              f"{percentile(values, 50):>10.1f} {percentile(values, 95):>10.1f} {percentile(values, 99):>10.1f} "
+              f"{sum(values) / 1000:>9.1f}")
+
+def print_slowest_requests(spans, top):
+    by_request = defaultdict(list)
+    for s in spans:
+        if s.get("request_id"):
+            by_request[s["request_id"]].append(s)
+
+    requests = [s for s in spans if s.get("kind") == "request"]
+    requests.sort(key=lambda s: s["duration_ms"], reverse=True)
+    print(f"\nSlowest {min(top, len(requests))} requests:")
+    for s in requests[:top]:
+        attributes = s.get("attributes", {})
+        print(f"- {s['duration_ms']:.0f} ms  request={s['request_id']} thread={s.get('thread_id')} "
+              f"path={attributes.get('path', '?')} at {s['ts']}")
+        # 每個請求內耗時最多的節點與 LLM 呼叫
+        children = [c for c in by_request[s["request_id"]] if c.get("kind") in ("node", "llm")]
+        children.sort(key=lambda c: c["duration_ms"], reverse=True)
+        print("    " + ", ".join(f"{c['kind']}:{c['name']} {c['duration_ms']:.0f}ms" for c in children[:5]))
+
+def main(path, top, kinds):
+    paths = trace_files(path)
+    if not paths:
+        logger.error(f"No trace files found at {path} (set TRACE_ENABLED=true)")
+        sys.exit(1)
+    spans = load_spans(paths)
+    logger.info(f"Loaded {len(spans)} spans from {len(paths)} files")
+    print_latency_table(spans, kinds)
+    print_slowest_requests(spans, top)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize JSONL trace spans: p50/p95/p99 per node and the slowest requests.")
+    parser.add_argument("--path", type=str, default=settings.get_absolute_trace_log_path(), help="Trace file (rotated backups are included).")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest requests to show (default: 10).")
+    parser.add_argument("--kind", type=str, nargs="+", default=["request", "node", "llm", "model"], help="Span kinds in the latency table.")
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    main(args.path, args.top, set(args.kind))
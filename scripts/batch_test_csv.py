@@ -1,6 +1,7 @@
 # python scripts/batch_test_csv.py --input QAtest.csv
 import os
 import sys
+import asyncio
 import pandas as pd
 import uuid
 import argparse
@@ -17,7 +18,7 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-def run_batch_test(input_file, output_file, question_column):
+async def run_batch_test(input_file, output_file, question_column):
     logger.info(f"Loading questions from: {input_file}")
     if not os.path.exists(input_file):
         logger.error(f"File {input_file} not found.")
@@ -45,7 +46,7 @@ def run_batch_test(input_file, output_file, question_column):
         
         try:
             # 呼叫模型
-            output = graph.invoke({"original_query": question}, config=config)
+            output = await graph.ainvoke({"original_query": question}, config=config)
             model_answer = output.get("final_answer", "No answer generated.")
             retrieval_context = output.get("context", "No context retrieved.")
         except Exception as e:
@@ -77,4 +78,4 @@ if __name__ == "__main__":
         args.output = f"{base}_results{ext}"
     
     logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    run_batch_test(args.input, args.output, args.column)
+    asyncio.run(run_batch_test(args.input, args.output, args.column))
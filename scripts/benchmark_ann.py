@@ -0,0 +1,107 @@
+# python scripts/benchmark_ann.py [--synthetic 500000] [--dim 1024] [--real] [--ef 32 64 128 256] [--nprobe 4 8 16 32 64]
+import os
+import sys
+import time
+import argparse
+import logging
+
+# Ensure the project root is in sys.path
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import faiss
+import numpy as np
+from backend.config import settings
+from backend.ann_index import create_index
+
+logger = logging.getLogger(__name__)
+
+def synthetic_data(n, dim, num_queries, seed=0):
+    """以高斯混合產生有群聚結構的向量 (均勻亂數對 ANN 過於困難、不具代表性)"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, n // 500), dim)).astype(np.float32)
+    def sample(count):
+        labels = rng.integers(len(centers), size=count)
+        return centers[labels] + 0.3 * rng.normal(size=(count, dim)).astype(np.float32)
+    return sample(n), sample(num_queries)
+
+def real_data(num_queries):
+    """知識庫文件向量 (使用 embedding 快取) 與以問題文字計算的查詢向量"""
+    from backend.ingestion import load_documents, EmbeddingCache
+    from backend.inference_backend import load_embeddings, embedding_model_id
+
+    documents = load_documents(settings.get_absolute_data_path())
+    embeddings = load_embeddings()
+    cache = EmbeddingCache(settings.get_absolute_embedding_cache_path(), embedding_model_id())
+    vectors = np.asarray(cache.embed([doc.page_content for doc in documents], embeddings), dtype=np.float32)
+    questions = [doc.page_content.replace('問題:', '', 1).strip() for doc in documents][:num_queries]
+    queries = np.asarray(embeddings.embed_documents(questions), dtype=np.float32)
+    return vectors, queries
+
+def index_size_mb(index):
+    return faiss.serialize_index(index).nbytes / 1024 / 1024
+
+def measure(index, queries, k, ground_truth):
+    """單筆查詢逐一搜尋 (與線上服務相同)，回傳 (QPS, recall@k)"""
+    results = np.empty((len(queries), k), dtype=np.int64)
+    start = time.perf_counter()
+    for i, query in enumerate(queries):
+        _, results[i] = index.search(query[None, :], k)
+    elapsed = time.perf_counter() - start
+    recall = np.mean([len(set(r) & set(g)) / k for r, g in zip(results, ground_truth)])
+    return len(queries) / elapsed, recall
+
+def benchmark(name, vectors, queries, k, ef_values, nprobe_values):
+    print(f"\n=== {name}: {len(vectors)} vectors, dim {vectors.shape[1]}, {len(queries)} queries, k={k} ===")
+    print(f"{'index':<8} {'param':<14} {'build s':>8} {'size MB':>9} {'QPS':>9} {'recall@' + str(k):>10}")
+
+    rows = []
+    for index_type in ("flat", "hnsw", "ivfpq"):
+        start = time.perf_counter()
+        index = create_index(vectors, index_type)
+        index.add(vectors)
+        build_time = time.perf_counter() - start
+        rows.append((index_type, index, build_time))
+
+    flat = rows[0][1]
+    _, ground_truth = flat.search(queries, k)
+    # 建置可用多執行緒；與線上服務相同，以單執行緒量測單筆查詢
+    faiss.omp_set_num_threads(1)
+
+    for index_type, index, build_time in rows:
+        size = index_size_mb(index)
+        if isinstance(index, faiss.IndexHNSW):
+            params = [("efSearch", ef) for ef in ef_values]
+        elif isinstance(index, faiss.IndexIVF):
+            params = [("nprobe", p) for p in nprobe_values if p <= index.nlist]
+        else:
+            params = [("-", None)]
+        for param, value in params:
+            if param == "efSearch":
+                index.hnsw.efSearch = value
+            elif param == "nprobe":
+                index.nprobe = value
+            qps, recall = measure(index, queries, k, ground_truth)
+            label = f"{param}={value}" if value is not None else "exact"
+            print(f"{index_type:<8} {label:<14} {build_time:>8.1f} {size:>9.1f} {qps:>9.0f} {recall:>10.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare Flat, HNSW and IVF-PQ FAISS indexes (QPS, memory, recall@k against Flat).")
+    parser.add_argument("--synthetic", type=int, default=100000, help="Number of synthetic vectors (0 to skip, default: 100000).")
+    parser.add_argument("--dim", type=int, default=1024, help="Synthetic vector dimension (default: 1024, same as the embedding model).")
+    parser.add_argument("--real", action="store_true", help="Also benchmark on the knowledge base embeddings (loads the embedding model).")
+    parser.add_argument("--queries", type=int, default=1000, help="Number of queries (default: 1000).")
+    parser.add_argument("--k", type=int, default=settings.TOP_K_RETRIEVAL, help="Neighbours per query (default: TOP_K_RETRIEVAL).")
+    parser.add_argument("--ef", type=int, nargs="+", default=[32, 64, 128, 256], help="HNSW efSearch values to sweep.")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32, 64], help="IVF nprobe values to sweep.")
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    if args.synthetic:
+        vectors, queries = synthetic_data(args.synthetic, args.dim, args.queries)
+        benchmark("synthetic", vectors, queries, args.k, args.ef, args.nprobe)
+    if args.real:
+        vectors, queries = real_data(args.queries)
+        benchmark("knowledge base", vectors, queries, args.k, args.ef, args.nprobe)
@@ -0,0 +1,78 @@
+# python scripts/benchmark_history.py [--sizes 10 50 100 200 500 1000] [--retries 1] [--repeat 200]
+import os
+import sys
+import time
+import argparse
+import logging
+
+# Ensure the project root is in sys.path
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from backend.config import settings
+from backend.graph import GraphBuilder
+from backend.history import render_message, select_recent_messages
+
+QUESTION = "我這個月加班了 12 小時，平日加班費要怎麼計算？需要先申請嗎？"
+ANSWER = "同仁您好，根據公司規定，平日加班前 2 小時以時薪 1.34 倍計算，第 3 小時起以 1.67 倍計算。" * 3
+
+def build_thread(num_messages):
+    messages = []
+    for i in range(num_messages // 2):
+        messages.append(HumanMessage(content=f"{QUESTION} ({i})"))
+        messages.append(AIMessage(content=ANSWER))
+    return messages
+
+def full_render_turn(builder, messages, retries):
+    """舊做法：guardrail、每次 rewrite 都重新呈現整個 thread，generate 送出全部訊息"""
+    for _ in range(2 + retries):
+        builder._format_messages_to_str(messages)
+    # generate 逐則加入 llm_messages
+    [m for m in messages if not isinstance(m, SystemMessage)]
+
+def incremental_turn(builder, state, retries):
+    """新做法：initialize 只呈現新訊息，各節點由 history_lines 取預算內的結尾"""
+    messages = state["messages"]
+    rendered = len(state["history_lines"])
+    state["history_lines"].extend(render_message(m) for m in messages[rendered:-1])
+    builder._history_for(state, "guardrail")
+    for _ in range(1 + retries):
+        builder._history_for(state, "rewrite")
+    select_recent_messages(messages, settings.HISTORY_TOKEN_BUDGETS.get("generate", 0))
+
+def measure(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def main(sizes, retries, repeat):
+    # classify / guardrail 等 LLM chain 只建立不呼叫，不需要 RAG 元件
+    builder = GraphBuilder(None)
+    print(f"{'messages':>9} {'full render µs/turn':>20} {'incremental µs/turn':>20} {'speedup':>8}")
+    for size in sizes:
+        messages = build_thread(size) + [HumanMessage(content=QUESTION)]
+        full = measure(lambda: full_render_turn(builder, messages, retries), repeat)
+
+        # 模擬上一輪已呈現的 history_lines，每輪只新增上一輪的問答兩則
+        base_lines = [render_message(m) for m in messages[:-3]]
+        def turn():
+            state = {"messages": messages, "history_lines": list(base_lines)}
+            incremental_turn(builder, state, retries)
+        # list(base_lines) 的複製成本不屬於實際流程 (reducer 追加)，另外扣除
+        copy_cost = measure(lambda: list(base_lines), repeat)
+        incremental = max(0.0, measure(turn, repeat) - copy_cost)
+        print(f"{size:>9} {full:>20.1f} {incremental:>20.1f} {full / incremental if incremental else float('inf'):>7.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-turn history rendering cost: full re-render vs incremental history_lines.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100, 200, 500, 1000], help="Thread sizes (messages) to test.")
+    parser.add_argument("--retries", type=int, default=1, help="Rewrite retries per turn (default: 1).")
+    parser.add_argument("--repeat", type=int, default=200, help="Repetitions per measurement (default: 200).")
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    main(args.sizes, args.retries, args.repeat)
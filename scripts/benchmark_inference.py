@@ -0,0 +1,116 @@
+# python scripts/benchmark_inference.py [--backends torch onnx onnx_int8] [--queries 100] [--threads 0]
+import os
+import sys
+import time
+import argparse
+import logging
+import multiprocessing as mp
+
+# Ensure the project root is in sys.path
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import numpy as np
+from backend.config import settings
+from backend.inference_backend import BACKENDS
+
+logger = logging.getLogger(__name__)
+
+def peak_rss_mb():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    except ImportError:
+        import resource
+        # Linux 上 ru_maxrss 單位為 KB
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_backend(backend, threads, num_queries, queue):
+    """在獨立的子行程中載入模型並量測，避免不同後端的記憶體互相影響"""
+    from backend.ingestion import load_documents
+    from backend.inference_backend import load_embeddings, load_cross_encoder, configure_threads
+
+    configure_threads(threads)
+    documents = load_documents(settings.get_absolute_data_path())
+    contents = [doc.page_content for doc in documents]
+    queries = [doc.page_content.replace('問題:', '', 1).strip() for doc in documents][:num_queries]
+
+    start = time.perf_counter()
+    embeddings = load_embeddings(backend, threads)
+    cross_encoder = load_cross_encoder(backend, threads)
+    load_time = time.perf_counter() - start
+
+    doc_vectors = np.asarray(embeddings.embed_documents(contents), dtype=np.float32)
+    embed_latencies, rerank_latencies = [], []
+    query_vectors, rerank_scores = [], []
+    for query in queries:
+        start = time.perf_counter()
+        vector = np.asarray(embeddings.embed_query(query), dtype=np.float32)
+        embed_latencies.append(time.perf_counter() - start)
+        query_vectors.append(vector)
+
+        # 與正式流程相同：以向量檢索的前 TOP_K_RETRIEVAL 筆做 rerank
+        top = np.argsort(-doc_vectors @ vector)[:settings.TOP_K_RETRIEVAL]
+        start = time.perf_counter()
+        scores = cross_encoder.score([(query, contents[i]) for i in top])
+        rerank_latencies.append(time.perf_counter() - start)
+        rerank_scores.append((top.tolist(), [float(s) for s in scores]))
+
+    queue.put({
+        "backend": backend,
+        "load_time": load_time,
+        "rss_mb": peak_rss_mb(),
+        "embed_ms": np.percentile(embed_latencies, [50, 95]) * 1000,
+        "rerank_ms": np.percentile(rerank_latencies, [50, 95]) * 1000,
+        "doc_vectors": doc_vectors,
+        "query_vectors": np.stack(query_vectors),
+        "rerank_scores": rerank_scores,
+    })
+
+def compare(reference, result, k):
+    """與 torch 後端比較：檢索 recall@k、rerank 分數誤差與 top-1 一致率"""
+    ref_top = np.argsort(-reference["query_vectors"] @ reference["doc_vectors"].T, axis=1)[:, :k]
+    top = np.argsort(-result["query_vectors"] @ result["doc_vectors"].T, axis=1)[:, :k]
+    recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(ref_top, top)])
+
+    errors, agree = [], []
+    for (ref_ids, ref_scores), (ids, scores) in zip(reference["rerank_scores"], result["rerank_scores"]):
+        ref_map = dict(zip(ref_ids, ref_scores))
+        errors.extend(abs(ref_map[i] - s) for i, s in zip(ids, scores) if i in ref_map)
+        agree.append(ref_ids[int(np.argmax(ref_scores))] == ids[int(np.argmax(scores))])
+    return recall, float(np.mean(errors)) if errors else float("nan"), float(np.mean(agree))
+
+def main(backends, num_queries, threads):
+    ctx = mp.get_context("spawn")
+    results = {}
+    for backend in backends:
+        logger.info(f"Benchmarking backend: {backend}")
+        queue = ctx.Queue()
+        process = ctx.Process(target=run_backend, args=(backend, threads, num_queries, queue))
+        process.start()
+        results[backend] = queue.get()
+        process.join()
+
+    reference = results.get("torch")
+    print(f"\n{'backend':<10} {'load s':>7} {'RSS MB':>8} {'embed p50/p95 ms':>18} {'rerank p50/p95 ms':>19} "
+          f"{'recall@' + str(settings.TOP_K_RETRIEVAL):>10} {'score MAE':>10} {'top1 agree':>11}")
+    for backend, result in results.items():
+        line = (f"{backend:<10} {result['load_time']:>7.1f} {result['rss_mb']:>8.0f} "
+                f"{result['embed_ms'][0]:>8.1f}/{result['embed_ms'][1]:<9.1f} "
+                f"{result['rerank_ms'][0]:>8.1f}/{result['rerank_ms'][1]:<10.1f}")
+        if reference is not None and backend != "torch":
+            recall, mae, agree = compare(reference, result, settings.TOP_K_RETRIEVAL)
+            line += f" {recall:>10.3f} {mae:>10.4f} {agree:>11.1%}"
+        print(line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare latency, memory and accuracy of the embedding/reranker inference backends.")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS), help="Backends to benchmark (torch is the accuracy reference).")
+    parser.add_argument("--queries", type=int, default=100, help="Number of KB questions to use as queries (default: 100).")
+    parser.add_argument("--threads", type=int, default=settings.INFERENCE_THREADS, help="CPU threads per backend (0 = library default).")
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    main(args.backends, args.queries, args.threads)
@@ -0,0 +1,48 @@
+# python scripts/build_index.py [--data backend/data/QA617.csv] [--full] [--force]
+import os
+import sys
+import argparse
+import logging
+
+# Ensure the project root is in sys.path
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from backend.config import settings
+from backend.ingestion import load_documents
+from backend.index_store import compute_index_key, load_index, ingest_documents
+from backend.inference_backend import load_embeddings, embedding_model_id
+
+logger = logging.getLogger(__name__)
+
+def build_index(data_path, force, full):
+    data_path = os.path.abspath(data_path)
+    logger.info(f"Loading data from: {data_path}")
+    documents = load_documents(data_path)
+    logger.info(f"Loaded {len(documents)} records")
+
+    key = compute_index_key(data_path)
+    logger.info(f"Index key: {key} (model: {embedding_model_id()})")
+
+    embeddings = load_embeddings()
+
+    if not force and load_index(key, embeddings) is not None:
+        logger.info("Index is up to date, nothing to do.")
+        return
+
+    # 預設只處理與上一版索引的差異列；--full 忽略舊索引 (仍會使用 embedding 快取)
+    ingest_documents(documents, embeddings, key, incremental=not full, persist=True)
+
+    logger.info(f"Done! Index written to: {os.path.join(settings.get_absolute_index_dir(), key)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prebuild the persisted FAISS index for the knowledge base.")
+    parser.add_argument("--data", type=str, default=settings.get_absolute_data_path(), help="Path to the QA CSV file (default: DATA_PATH).")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if an up-to-date index exists.")
+    parser.add_argument("--full", action="store_true", help="Rebuild from scratch instead of updating the previous index incrementally.")
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    build_index(args.data, args.force, args.full)
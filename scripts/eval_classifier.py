@@ -0,0 +1,110 @@
+# python scripts/eval_classifier.py [--llm] [--limit 200] [--output classifier_eval.csv]
+import os
+import sys
+import time
+import json
+import asyncio
+import argparse
+import logging
+from collections import Counter
+
+# Ensure the project root is in sys.path
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import pandas as pd
+from tqdm import tqdm
+from backend.config import settings
+from backend.ingestion import load_documents
+from backend.index_store import load_or_build_vectorstore
+from backend.category_classifier import EmbeddingCategoryClassifier
+from backend.inference_backend import load_embeddings
+from backend.graph import GraphBuilder
+
+logger = logging.getLogger(__name__)
+
+async def classify_with_llm(chain, question):
+    response = await chain.ainvoke({"question": question})
+    try:
+        return json.loads(response).get("category", "other")
+    except json.JSONDecodeError:
+        return "other"
+
+async def run_evaluation(limit, use_llm, output_file):
+    data_path = settings.get_absolute_data_path()
+    documents = load_documents(data_path)
+    embeddings = load_embeddings()
+    vectorstore = load_or_build_vectorstore(documents, embeddings, data_path)
+    classifier = EmbeddingCategoryClassifier(
+        vectorstore,
+        min_score=settings.LOCAL_CLASSIFIER_MIN_SCORE,
+        min_margin=settings.LOCAL_CLASSIFIER_MIN_MARGIN
+    )
+
+    if limit:
+        documents = documents[:limit]
+    questions = [doc.page_content.replace('問題:', '', 1).strip() for doc in documents]
+    labels = [doc.metadata.get("category", "other") for doc in documents]
+    vectors = embeddings.embed_documents(questions)
+    # 知識庫中實際儲存的向量 (含「問題:」前綴)，用於 leave-one-out
+    positions = {doc_id: pos for pos, doc_id in vectorstore.index_to_docstore_id.items()}
+    stored_vectors = [vectorstore.index.reconstruct(positions[doc.id]) for doc in documents]
+
+    # classify_query 的 LLM chain 不需要 RAG 元件
+    llm_chain = GraphBuilder(None).classification_chain if use_llm else None
+
+    rows = []
+    local_time = 0.0
+    llm_time = 0.0
+    for question, label, vector, stored in tqdm(zip(questions, labels, vectors, stored_vectors), total=len(questions), desc="Classifying"):
+        start = time.perf_counter()
+        # leave-one-out：將此筆資料自所屬分類質心中扣除，避免自我命中
+        result = classifier.classify(question, vector, exclude=(label, stored) if label in classifier.labels else None)
+        local_time += time.perf_counter() - start
+
+        row = {
+            "question": question,
+            "label": label,
+            "local": result[0] if result else None,
+            "local_method": result[2] if result else "fallback",
+            "local_score": result[1] if result else None,
+        }
+        if llm_chain is not None:
+            start = time.perf_counter()
+            row["llm"] = await classify_with_llm(llm_chain, question)
+            llm_time += time.perf_counter() - start
+        rows.append(row)
+
+    df = pd.DataFrame(rows)
+    total = len(df)
+    confident = df[df["local"].notna()]
+    methods = Counter(df["local_method"])
+
+    print(f"\nEvaluated {total} KB questions")
+    print(f"Local classifier coverage: {len(confident) / total:.1%} "
+          f"(keyword {methods['keyword']}, centroid {methods['centroid']}, fallback {methods['fallback']})")
+    if len(confident):
+        print(f"Local accuracy on confident predictions: {(confident['local'] == confident['label']).mean():.1%}")
+    print(f"Local latency: {local_time / total * 1e6:.0f} µs/question (excluding embedding)")
+
+    if llm_chain is not None:
+        df["combined"] = df["local"].fillna(df["llm"])
+        print(f"LLM accuracy: {(df['llm'] == df['label']).mean():.1%} ({llm_time / total * 1000:.0f} ms/question)")
+        print(f"Local + LLM fallback accuracy: {(df['combined'] == df['label']).mean():.1%} "
+              f"(LLM calls saved: {len(confident) / total:.1%})")
+
+    if output_file:
+        df.to_csv(output_file, index=False, encoding='utf-8-sig')
+        logger.info(f"Per-question results saved to: {output_file}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the local category classifier against the LLM classifier on the KB.")
+    parser.add_argument("--limit", type=int, default=0, help="Only evaluate the first N questions (default: all).")
+    parser.add_argument("--llm", action="store_true", help="Also run the LLM classifier (requires Ollama).")
+    parser.add_argument("--output", type=str, help="Path to save per-question results as CSV (optional).")
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    asyncio.run(run_evaluation(args.limit, args.llm, args.output))
@@ -0,0 +1,102 @@
+import pytest
+from backend.calculator import extract_calculation, extract_duration_minutes, extract_salary, parse_number
+from backend.tools import calculate_vacation_pay, calculate_unused_overtime_pay
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("45000", 45000),
+    ("45,000", 45000),
+    ("4.5萬", 45000),
+    ("4萬5", 45000),
+    ("45k", 45000),
+    ("四萬五", 45000),
+    ("三千二", 3200),
+])
+def test_parse_number(text, expected):
+    assert parse_number(text) == expected
+
+
+def test_extract_salary_requires_keyword_and_single_amount():
+    assert extract_salary("月薪45000") == 45000
+    assert extract_salary("我有45000元") is None
+    assert extract_salary("月薪45000，薪水50000") is None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("3天", 1440),
+    ("半天", 240),
+    ("2天半", 1200),
+    ("1個半小時", 90),
+    ("1天又3小時30分鐘", 480 + 180 + 30),
+    ("5h30m", 330),
+    ("5h 30min", 330),
+    ("45分", 45),
+])
+def test_extract_duration_minutes(text, expected):
+    assert extract_duration_minutes(text) == expected
+
+
+def test_extract_duration_rejects_multiple_groups():
+    assert extract_duration_minutes("加班3小時，補休1小時") is None
+
+
+@pytest.mark.parametrize("text", ["5h30", "5h30s", "3天5", "2天又3小時20秒"])
+def test_extract_duration_rejects_unparsed_text(text):
+    assert extract_duration_minutes(text) is None
+
+
+@pytest.mark.parametrize("query, tool, args", [
+    (
+        "月薪45000，未休特休3天可以領多少？",
+        calculate_vacation_pay.name,
+        {"monthly_salary": 45000, "half_days_unused": 6},
+    ),
+    (
+        "薪水4萬5，剩下的特休2天半折算多少錢",
+        calculate_vacation_pay.name,
+        {"monthly_salary": 45000, "half_days_unused": 5},
+    ),
+    (
+        "月薪4萬5，剩5h30m加班可以領多少",
+        calculate_unused_overtime_pay.name,
+        {"monthly_salary": 45000, "half_days": 1, "remaining_minutes": 90},
+    ),
+    (
+        "月薪40000，加班沒休的5小時可以換成錢嗎？能領多少",
+        calculate_unused_overtime_pay.name,
+        {"monthly_salary": 40000, "half_days": 1, "remaining_minutes": 60},
+    ),
+])
+def test_extract_calculation_settlement(query, tool, args):
+    assert extract_calculation(query) == {"tool": tool, "args": args}
+
+
+def test_extract_calculation_uses_history():
+    history = ["我月薪45000，想問特休的問題"]
+    assert extract_calculation("那未休2天可以領多少？", history) == {
+        "tool": calculate_vacation_pay.name,
+        "args": {"monthly_salary": 45000, "half_days_unused": 4},
+    }
+
+
+@pytest.mark.parametrize("query", [
+    # 請假扣薪
+    "月薪45000，請特休3天會扣多少薪水？",
+    # 補休時數、期限
+    "加班3小時可以補休多少時間？",
+    "補休3天期限是多久？要怎麼算",
+    # 計算規定
+    "加班2小時，加班費算法是什麼",
+    "月薪45000，未休特休3天的計算方式與規定",
+    # 依倍率計算的加班費
+    "月薪45000，平日加班2小時沒休可以領多少",
+    # 時數無法完整解析
+    "月薪4萬5，剩5h30s加班可以領多少",
+    # 有結算字眼但未詢問金額
+    "月薪45000元 剩下特休3天 要多少天才能用完",
+    # 缺少結算字眼或月薪
+    "月薪45000，特休3天是多少錢",
+    "未休特休3天可以領多少？",
+])
+def test_extract_calculation_rejects_non_settlement(query):
+    assert extract_calculation(query) is None
@@ -0,0 +1,55 @@
+import pytest
+from backend.postprocess import CLOSING, GREETING, check_answer, local_optimize, normalize_markdown
+
+
+class _IdentityConverter:
+    def convert(self, text: str) -> str:
+        return text
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("• 病假\n● 事假", "- 病假\n- 事假"),
+    ("* 病假\n  * 事假", "- 病假\n  - 事假"),
+    ("**粗體**說明", "**粗體**說明"),
+    ("* **病假**：30 日", "- **病假**：30 日"),
+    ("##特休規定", "## 特休規定"),
+])
+def test_normalize_markdown(text, expected):
+    assert normalize_markdown(text) == expected
+
+
+@pytest.mark.parametrize("answer", [
+    "## 特休規定\n依年資給假。",
+    "- 病假：30 日",
+    "1. 填寫假單",
+    "| 假別 | 天數 |\n| --- | --- |\n| 病假 | 30 |",
+])
+def test_local_optimize_greeting_before_block(answer):
+    result = local_optimize(answer, _IdentityConverter())
+    assert result.startswith(f"{GREETING}，\n\n{answer}")
+    assert result.endswith(CLOSING)
+
+
+def test_local_optimize_greeting_inline_for_paragraph():
+    result = local_optimize("**病假**一年以 30 日為限。", _IdentityConverter())
+    assert result == f"{GREETING}，**病假**一年以 30 日為限。\n\n{CLOSING}"
+
+
+def test_local_optimize_keeps_existing_greeting_and_closing():
+    answer = f"{GREETING}，特休依年資給假。\n\n{CLOSING}"
+    assert local_optimize(answer, _IdentityConverter()) == answer
+
+
+@pytest.mark.parametrize("answer, reason", [
+    ("", "empty"),
+    ("特休�規定", "garbled"),
+    ('{"answer": "特休"}', "format"),
+    ("<think>想一下</think>特休依年資給假", "format"),
+    ("```\n未閉合", "format"),
+])
+def test_check_answer_rejects(answer, reason):
+    assert check_answer(answer, 0.5) == reason
+
+
+def test_check_answer_accepts_chinese():
+    assert check_answer("同仁您好，特休依年資給假，請於 HR 系統申請。", 0.5) is None
@@ -0,0 +1,37 @@
+import pytest
+from backend.semantic_cache import SemanticCache
+
+
+def _result(**overrides):
+    result = {"error": "pass", "final_answer": "同仁您好，特休依年資給假。", "tool_call_count": 0, "fast_path": ""}
+    result.update(overrides)
+    return result
+
+
+def test_general_answer_is_cacheable():
+    assert SemanticCache.is_cacheable("特休怎麼請？", _result())
+
+
+def test_calculator_fast_path_is_not_cacheable():
+    result = _result(fast_path="calculator", final_answer="同仁您好，依您提供的資料試算未休特休假工資如下：\n\n- 月薪：45,000 元")
+    assert not SemanticCache.is_cacheable("特休剩下的可以領多少", result)
+    assert not SemanticCache.is_cacheable("月薪 45000 元 特休剩 3 天 可以領多少", result)
+
+
+@pytest.mark.parametrize("error", ["blocked", "no_content", "no"])
+def test_unsupported_answers_are_not_cacheable(error):
+    assert not SemanticCache.is_cacheable("特休怎麼請？", _result(error=error))
+
+
+def test_tool_answers_are_not_cacheable():
+    assert not SemanticCache.is_cacheable("特休怎麼請？", _result(tool_call_count=1))
+
+
+@pytest.mark.parametrize("query", [
+    "月薪 45000 元 特休剩 3 天 可以領多少",
+    "月薪45k，加班5h30m可以換多少",
+    "月薪4萬5的特休工資",
+    "加班３ 小時",
+])
+def test_queries_with_quantities_are_not_cacheable(query):
+    assert not SemanticCache.is_cacheable(query, _result())